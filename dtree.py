@@ -7,8 +7,34 @@ Implements decision trees, decision stumps, decision tree pruning, and
 adaptive boosting.
 """
 
+import array
+import binascii
+import copy
+import cPickle
+import functools
+import hashlib
+import heapq
+import itertools
 import math
+import multiprocessing
+import os
 import random
+import time
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BACKEND_PYTHON = "python"
+BACKEND_NUMPY = "numpy"
+BACKEND_BITSET = "bitset"
+
+PARALLEL_MIN_INSTANCES = 1000
+# a parallel build splits nodes in the parent until there are about this
+# many subtrees per worker
+PARALLEL_TASKS_PER_WORKER = 4
 
 def log2(dbl):
     return math.log(dbl)/math.log(2.0) if dbl > 0.0 else 0.0
@@ -31,6 +57,162 @@ class Instance(object):
         return ("Instance(%r, %r, %.2f)"
                 % (self.listAttrs, self.fLabel, self.dblWeight))
 
+class Dataset(object):
+    """A columnar collection of instances.
+
+    Attribute values are kept in one packed integer array per attribute
+    (listCol), labels in a bitmap (bitsLabel, one bit per row), and weights
+    in a float64 array (arrWeight). Rows are addressed by integer index.
+    Iterating over a Dataset yields Instance copies of its rows, so a Dataset
+    can be passed anywhere a list of instances is read."""
+    def __init__(self, listCol, bitsLabel, arrWeight):
+        self.listCol = listCol
+        self.bitsLabel = bitsLabel
+        self.arrWeight = arrWeight
+        # the BitsetIndex of all rows, built on demand by bitset_index
+        self.bitsetIndex = None
+    def __len__(self):
+        return len(self.arrWeight)
+    def count_attributes(self):
+        return len(self.listCol)
+    def label(self, ix):
+        return bool(self.bitsLabel[ix >> 3] & (1 << (ix & 7)))
+    def set_label(self, ix, fLabel):
+        self.bitsetIndex = None
+        if fLabel:
+            self.bitsLabel[ix >> 3] |= 1 << (ix & 7)
+        else:
+            self.bitsLabel[ix >> 3] &= ~(1 << (ix & 7)) & 0xFF
+    def attrs(self, ix):
+        return [col[ix] for col in self.listCol]
+    def instance(self, ix):
+        return Instance(self.attrs(ix), self.label(ix), self.arrWeight[ix])
+    def take(self, iterableIx):
+        """Return a new Dataset holding the given rows, in order."""
+        listIx = list(iterableIx)
+        listCol = [pack_column([col[ix] for ix in listIx])
+                   for col in self.listCol]
+        bitsLabel = pack_labels([self.label(ix) for ix in listIx])
+        arrWeight = array.array("d", [self.arrWeight[ix] for ix in listIx])
+        return Dataset(listCol, bitsLabel, arrWeight)
+    def copy(self):
+        listCol = [array.array(col.typecode, col) for col in self.listCol]
+        return Dataset(listCol, bytearray(self.bitsLabel),
+                       array.array("d", self.arrWeight))
+    def _index(self, ix):
+        cLen = len(self)
+        if ix < 0:
+            ix += cLen
+        if not 0 <= ix < cLen:
+            raise IndexError("Dataset index out of range")
+        return ix
+    def __iter__(self):
+        for ix in xrange(len(self)):
+            yield self.instance(ix)
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(xrange(*key.indices(len(self))))
+        return self.instance(self._index(key))
+    def __getslice__(self, ixStart, ixEnd):
+        return self[max(ixStart,0):max(ixEnd,0):]
+    def __repr__(self):
+        return "Dataset(%d rows, %d attributes)" % (len(self),
+                                                    len(self.listCol))
+
+def pack_column(listValue):
+    """Return an array holding the integers in listValue, using the smallest
+    array type code that can represent all of them.
+
+    >>> pack_column([1,10,3]).typecode
+    'b'
+    >>> pack_column([1,1000]).typecode
+    'h'"""
+    if listValue:
+        cMin,cMax = min(listValue),max(listValue)
+    else:
+        cMin = cMax = 0
+    for sCode in "bhil":
+        cBits = 8*array.array(sCode).itemsize - 1
+        if -(1 << cBits) <= cMin and cMax < (1 << cBits):
+            return array.array(sCode, listValue)
+    return array.array("l", listValue)
+
+def pack_labels(listLabel):
+    """Pack a list of booleans into a bitmap, one bit per label."""
+    bitsLabel = bytearray((len(listLabel) + 7) >> 3)
+    for ix,fLabel in enumerate(listLabel):
+        if fLabel:
+            bitsLabel[ix >> 3] |= 1 << (ix & 7)
+    return bitsLabel
+
+def build_dataset(listInst):
+    """Build a columnar Dataset from a list of labeled instances.
+
+    >>> ds = build_dataset([Instance([1,2],True), Instance([3,4],False,0.5)])
+    >>> ds.attrs(1), ds.label(1), ds.arrWeight[1]
+    ([3, 4], False, 0.5)"""
+    if isinstance(listInst, Dataset):
+        return listInst
+    listInst = list(listInst)
+    cAttr = count_instance_attributes(listInst) if listInst else 0
+    if cAttr is None:
+        raise TypeError("Instances provided have attribute lists of "
+                        "varying lengths.")
+    for inst in listInst:
+        if inst.fLabel is None:
+            raise TypeError("missing instance label")
+    listCol = [pack_column([inst.listAttrs[ixAttr] for inst in listInst])
+               for ixAttr in xrange(cAttr)]
+    bitsLabel = pack_labels([inst.fLabel for inst in listInst])
+    arrWeight = array.array("d", [inst.dblWeight for inst in listInst])
+    return Dataset(listCol, bitsLabel, arrWeight)
+
+def dedup_instances(listInst, fCount=False):
+    """Collapse instances with identical attributes and labels into one
+    instance, in the order they are first seen, whose weight is the sum of
+    their weights (or, if fCount is set, their number). Return a pair of the
+    unique instances, as a Dataset if listInst is backed by one, and the
+    compression ratio of the number of instances to the number of unique
+    instances.
+
+    As weights are then summed in a different order, trees built from the
+    unique instances are identical to those built from listInst when the
+    weights are integers (such as the default 1.0), and may otherwise differ
+    only by rounding.
+
+    >>> listInst = [Instance([1],True), Instance([2],False),
+    ...             Instance([1],True,0.5)]
+    >>> dedup_instances(listInst)
+    ([Instance([1], True, 1.50), Instance([2], False)], 1.5)"""
+    ds,rows = dataset_rows(listInst)
+    if ds is not None:
+        iterableRows = ((tuple(ds.attrs(ix)), ds.label(ix), ds.arrWeight[ix])
+                        for ix in rows)
+    else:
+        iterableRows = ((tuple(inst.listAttrs), inst.fLabel, inst.dblWeight)
+                        for inst in listInst)
+    dictIx = {}
+    listUnique = []
+    listDblWeight = []
+    for tplAttrs,fLabel,dblWeight in iterableRows:
+        if fCount:
+            dblWeight = 1.0
+        tplKey = (tplAttrs, fLabel)
+        ix = dictIx.get(tplKey)
+        if ix is None:
+            dictIx[tplKey] = len(listUnique)
+            listUnique.append(tplKey)
+            listDblWeight.append(dblWeight)
+        else:
+            listDblWeight[ix] += dblWeight
+    listInstUnique = [Instance(list(tplAttrs), fLabel, dblWeight)
+                      for (tplAttrs,fLabel),dblWeight
+                      in itertools.izip(listUnique, listDblWeight)]
+    if ds is not None:
+        listInstUnique = build_dataset(listInstUnique)
+    dblRatio = len(listInst)/float(len(listUnique)) if listUnique else 1.0
+    return listInstUnique,dblRatio
+
 def compute_entropy(dblWeightTrue,dblWeightFalse):
     """ Given the total weight of true instances and the total weight
     of false instances in a collection, return the entropy of this
@@ -93,7 +275,84 @@ def compute_list_entropy(listInst):
     return compute_entropy_of_split({None:listInst})
 compute_list_entropy.is_support = True
 
-def choose_split_attribute(iterableIxAttr, listInst, dblMinGain=0.0):
+def count_by_attribute(iterableIxAttr, listInst):
+    """Build weighted label counts for every attribute in one pass over
+    listInst.
+
+    Returns a list of (attribute, count table) pairs in the order given by
+    iterableIxAttr, where each count table maps attribute values, in the order
+    they are first seen, to a [false weight, true weight] pair.
+
+    >>> listInst = [Instance([0,1],False), Instance([0,2],True,0.5)]
+    >>> count_by_attribute([1,0], listInst)
+    [(1, {1: [1.0, 0.0], 2: [0.0, 0.5]}), (0, {0: [1.0, 0.5]})]"""
+    listAttrCounts = [(ixAttr,{}) for ixAttr in iterableIxAttr]
+    add_to_counts(listAttrCounts, listInst)
+    return listAttrCounts
+
+def add_to_counts(listAttrCounts, listInst, ixStart=0, ixEnd=None):
+    """Add the instances of listInst[ixStart:ixEnd], in order, to the
+    (attribute, count table) pairs of listAttrCounts, as count_by_attribute
+    counts them."""
+    for inst in itertools.islice(listInst, ixStart, ixEnd):
+        assert inst.fLabel is not None
+        ixLabel = 1 if inst.fLabel else 0
+        dblW = inst.dblWeight
+        listAttrs = inst.listAttrs
+        for ixAttr,dictCount in listAttrCounts:
+            cValue = listAttrs[ixAttr]
+            listW = dictCount.get(cValue)
+            if listW is None:
+                listW = dictCount[cValue] = [0.0,0.0]
+            listW[ixLabel] += dblW
+
+def compute_entropy_of_counts(dictCount):
+    """Given a count table as built by count_by_attribute, return a pair of
+    (the average entropy of the split, a dictionary mapping each attribute
+    value to the entropy of its partition).
+
+    Weights are summed in the same order as compute_entropy_of_split, so the
+    results are identical to separating the instances and calling it, and
+    each partition's entropy is identical to compute_list_entropy."""
+    dblEntropy = 0.0
+    dblTotalWeight = 0.0
+    dictEntropy = {}
+    for cValue,(dblFWeight,dblTWeight) in dictCount.iteritems():
+        dblLocalW = dblTWeight + dblFWeight
+        dblLocalE = compute_entropy(dblTWeight,dblFWeight)*dblLocalW
+        dblEntropy += dblLocalE
+        dblTotalWeight += dblLocalW
+        dictEntropy[cValue] = dblLocalE/dblLocalW
+    return dblEntropy/dblTotalWeight,dictEntropy
+
+def choose_split_from_counts(listAttrCounts, dblPrevEntropy, dblMinGain=0.0):
+    """Given (attribute, count table) pairs and the entropy of the instances
+    they were counted from, return a pair of (the attribute with the greatest
+    information gain, the entropies of its partitions). If no attribute has a
+    gain greater than dblMinGain, return (None,None)."""
+    ixBest,dictBest,_ = choose_split_with_gain(listAttrCounts, dblPrevEntropy,
+                                               dblMinGain)
+    return ixBest,dictBest
+
+def choose_split_with_gain(listAttrCounts, dblPrevEntropy, dblMinGain=0.0):
+    """As choose_split_from_counts, but return a triple whose last element
+    is the gain of the chosen attribute (or None)."""
+    dblBestGain = dblMinGain
+    ixBest = None
+    dictBest = None
+    for ixAttr,dictCount in listAttrCounts:
+        dblEntropy,dictEntropy = compute_entropy_of_counts(dictCount)
+        dblGain = dblPrevEntropy - dblEntropy
+        if dblGain > dblBestGain:
+            dblBestGain = dblGain
+            ixBest = ixAttr
+            dictBest = dictEntropy
+    if ixBest is None:
+        return None,None,None
+    return ixBest,dictBest,dblBestGain
+
+def choose_split_attribute(iterableIxAttr, listInst, dblMinGain=0.0,
+                           dblPrevEntropy=None):
     """Given an iterator over attributes, choose the attribute which
     maximimizes the information gain of separating a collection of
     instances based on that attribute.
@@ -102,23 +361,129 @@ def choose_split_attribute(iterableIxAttr, listInst, dblMinGain=0.0):
     If the best information gain is less than dblMinGain, then return the
     pair (None,None).
 
+    Gains are scored from one pass of weighted label counts (see
+    count_by_attribute), and only the winning attribute's instances are
+    separated. dblPrevEntropy may be given if the entropy of listInst is
+    already known.
+
     >>> listInst = [Instance([0,0],False), Instance([0,1],True)]
     >>> choose_split_attribute([0,1], listInst)
     (1, {0: [Instance([0, 0], False)], 1: [Instance([0, 1], True)]})"""
-    dblBestGain = dblMinGain
-    ixBest = None
-    dictBest = None
-    dblPrevEntropy = compute_list_entropy(listInst)
-    for ixAttr in iterableIxAttr:
-        dictInst = separate_by_attribute(listInst, ixAttr)
-        dblEntropy = compute_entropy_of_split(dictInst)
+    if dblPrevEntropy is None:
+        dblPrevEntropy = compute_list_entropy(listInst)
+    listAttrCounts = count_by_attribute(iterableIxAttr, listInst)
+    ixBest,_ = choose_split_from_counts(listAttrCounts, dblPrevEntropy,
+                                        dblMinGain)
+    if ixBest is None:
+        return None,None
+    return ixBest,separate_by_attribute(listInst, ixBest)
+
+def weighted_entropy_of_counts(dictCount):
+    """Return the sum over the values of a count table of their weight
+    times the entropy of their labels. Adding instances to a count table
+    never decreases this sum."""
+    dblSum = 0.0
+    for dblFWeight,dblTWeight in dictCount.itervalues():
+        dblSum += compute_entropy(dblTWeight,dblFWeight)*(dblTWeight +
+                                                          dblFWeight)
+    return dblSum
+
+class BoundedSplitSearch(object):
+    """An exact branch-and-bound split search for build_tree_rec.
+
+    The candidate attributes are counted over the instances a chunk (a
+    dblChunk share of them) at a time. As the weighted entropy of a
+    partition only grows as instances are added, the counts of a prefix of
+    the instances bound from above the gain an attribute can reach over all
+    of them. After the first chunk the attribute with the highest bound is
+    counted in full and scored; after each further chunk, attributes whose
+    bound falls short of the best gain found so far (or of dblMinGain) are
+    dropped, and those still standing once every instance is counted are
+    scored. Counts are summed in instance order, so gains are identical to
+    choose_split_with_gain's, as is the attribute chosen; ties are broken
+    in favor of the attribute first in iterableIxAttr.
+
+    A bound can only fall short once the prefix holds more than 1 - g/H of
+    the instances, g being the best gain and H the node's entropy, so the
+    search pays off where the best split takes a large share of the
+    entropy. Nodes whose chunks would hold fewer than cMinChunk instances,
+    and nodes whose first scored gain is at most dblChunk*H, are counted in
+    one pass instead. cEvaluated and cSkipped count the attributes scored
+    and dropped."""
+    # the margin by which a bound must fall short, covering rounding error
+    BOUND_SLACK = 1e-9
+    def __init__(self, dblChunk=0.125, cMinChunk=64):
+        self.dblChunk = dblChunk
+        self.cMinChunk = cMinChunk
+        self.cEvaluated = 0
+        self.cSkipped = 0
+    def choose(self, iterableIxAttr, listInst, dblPrevEntropy,
+               dblMinGain=0.0):
+        """Return what choose_split_with_gain would for the count tables of
+        iterableIxAttr over listInst."""
+        listAttrCounts = [(ixAttr,{}) for ixAttr in iterableIxAttr]
+        cChunk = int(math.ceil(len(listInst)*self.dblChunk))
+        if (cChunk < self.cMinChunk or cChunk >= len(listInst) or
+            len(listAttrCounts) < 2):
+            add_to_counts(listAttrCounts, listInst)
+            self.cEvaluated += len(listAttrCounts)
+            return choose_split_with_gain(listAttrCounts, dblPrevEntropy,
+                                          dblMinGain)
+        dblWeight = 0.0
+        for inst in listInst:
+            dblWeight += inst.dblWeight
+        def bound(ixPos):
+            dictCount = listAttrCounts[ixPos][1]
+            return (dblPrevEntropy -
+                    weighted_entropy_of_counts(dictCount)/dblWeight)
+        add_to_counts(listAttrCounts, listInst, 0, cChunk)
+        listLive = range(len(listAttrCounts))
+        listBound = map(bound, listLive)
+        ixFirst = max(listLive, key=listBound.__getitem__)
+        add_to_counts([listAttrCounts[ixFirst]], listInst, cChunk)
+        tplBest = self.score(listAttrCounts, ixFirst, dblPrevEntropy,
+                             (dblMinGain,None,None))
+        listLive.remove(ixFirst)
+        cDone = cChunk
+        if tplBest[0] <= self.dblChunk*dblPrevEntropy:
+            # too weak a split for the bounds to drop anything early
+            add_to_counts([listAttrCounts[ixPos] for ixPos in listLive],
+                          listInst, cDone)
+            cDone = len(listInst)
+        while listLive and cDone < len(listInst):
+            dblCutoff = tplBest[0] - self.BOUND_SLACK
+            listKept = [ixPos for ixPos in listLive
+                        if listBound[ixPos] >= dblCutoff]
+            self.cSkipped += len(listLive) - len(listKept)
+            listLive = listKept
+            add_to_counts([listAttrCounts[ixPos] for ixPos in listLive],
+                          listInst, cDone, cDone + cChunk)
+            cDone += cChunk
+            if cDone < len(listInst):
+                for ixPos in listLive:
+                    listBound[ixPos] = bound(ixPos)
+        for ixPos in listLive:
+            tplBest = self.score(listAttrCounts, ixPos, dblPrevEntropy,
+                                 tplBest)
+        dblBestGain,ixBestPos,dictBest = tplBest
+        if ixBestPos is None:
+            return None,None,None
+        return listAttrCounts[ixBestPos][0],dictBest,dblBestGain
+    def score(self, listAttrCounts, ixPos, dblPrevEntropy, tplBest):
+        """Score the attribute at ixPos of listAttrCounts, whose counts are
+        complete, against tplBest, a tuple of (the best gain so far, its
+        position and its partition entropies), and return the better."""
+        self.cEvaluated += 1
+        dblEntropy,dictEntropy = compute_entropy_of_counts(
+            listAttrCounts[ixPos][1])
         dblGain = dblPrevEntropy - dblEntropy
-        if dblGain > dblBestGain:
-            dblBestGain = dblGain
-            ixBest = ixAttr
-            dictBest = dictInst
-    return ixBest,dictBest
-        
+        dblBestGain,ixBestPos,_ = tplBest
+        if dblGain > dblBestGain or (dblGain == dblBestGain and
+                                     ixBestPos is not None and
+                                     ixPos < ixBestPos):
+            return (dblGain,ixPos,dictEntropy)
+        return tplBest
+
 def check_for_common_label(listInst):
     """Return the boolean label shared by all instances in the given list of
     instances, or None if no such label exists.
@@ -163,6 +528,11 @@ class DTree(object):
         self.ixAttr = ixAttr
         self.dictChildren = {}
         self.fDefaultLabel = fDefaultLabel
+        # the information gain of a node's split, recorded by build_tree
+        self.dblGain = None
+        # the compression ratio of the instances the tree was built from,
+        # recorded at the root by build_tree when fDedup is set
+        self.dblDedupRatio = None
         if self.is_node() and self.fDefaultLabel is None:
             raise TypeError("Nodes require a valid fDefaultLabel")
     def is_leaf(self):
@@ -182,6 +552,7 @@ class DTree(object):
         self.fLabel = self.fDefaultLabel
         self.ixAttr = None
         self.fDefaultLabel = None
+        self.dblGain = None
         self.dictChildren = {}
     # the following methods are used in testing -- you should need
     # to worry about them
@@ -189,6 +560,7 @@ class DTree(object):
         if self.is_leaf():
             return DTree(fLabel=self.fLabel)
         dt = DTree(ixAttr=self.ixAttr, fDefaultLabel=self.fDefaultLabel)
+        dt.dblGain = self.dblGain
         for ixValue,dtChild in self.dictChildren.iteritems():
             dt.add(dtChild.copy(),ixValue)
         return dt
@@ -207,7 +579,8 @@ class DTree(object):
         return "".join(listRepr)
     
 
-def build_tree_rec(setIxAttr, listInst, dblMinGain, cRemainingLevels):
+def build_tree_rec(setIxAttr, listInst, dblMinGain, cRemainingLevels,
+                   dblEntropy=None, bss=None, fxnBuildChild=None):
     """Recursively build a decision tree.
 
     Given a set of integer attributes, a list of instances, a boolean default
@@ -234,7 +607,19 @@ def build_tree_rec(setIxAttr, listInst, dblMinGain, cRemainingLevels):
 
     When building tree nodes, the function specifies the majority label across
     listInst as the node's default label (fDefaultLabel argument to DTree's
-    __init__). This will be useful in pruning."""
+    __init__). This will be useful in pruning.
+
+    dblEntropy is the entropy of listInst if the caller already knows it;
+    each node passes its children the partition entropies it computed while
+    choosing its split.
+
+    If bss, a BoundedSplitSearch, is given, it chooses each split; the tree
+    is the same.
+
+    fxnBuildChild(dt, cValue, setIxAttr, listInst, dblMinGain,
+    cRemainingLevels, dblEntropy), if given, builds each child in place of
+    this function and adds it to dt for cValue, possibly later (see
+    ParallelTreeBuilder). It must leave setIxAttr as it found it."""
     # handle corner cases
     assert listInst
     fCommonLabel = check_for_common_label(listInst)
@@ -243,20 +628,121 @@ def build_tree_rec(setIxAttr, listInst, dblMinGain, cRemainingLevels):
     fMajority = majority_label(listInst)
     if not setIxAttr or cRemainingLevels == 0:
         return DTree(fLabel=fMajority)
-    ixAttr,dictInst = choose_split_attribute(setIxAttr, listInst, dblMinGain)
+    if dblEntropy is None:
+        dblEntropy = compute_list_entropy(listInst)
+    if bss is None:
+        listAttrCounts = count_by_attribute(setIxAttr, listInst)
+        ixAttr,dictEntropy,dblGain = choose_split_with_gain(
+            listAttrCounts, dblEntropy, dblMinGain)
+    else:
+        ixAttr,dictEntropy,dblGain = bss.choose(setIxAttr, listInst,
+                                                dblEntropy, dblMinGain)
     if ixAttr is None:
         return DTree(fLabel=fMajority)
 
     # we didn't fall into a corner case, so build the tree recursively
     dt = DTree(ixAttr=ixAttr, fDefaultLabel=fMajority)
+    dt.dblGain = dblGain
+    dictInst = separate_by_attribute(listInst, ixAttr)
     setIxAttr.remove(ixAttr)
     cNextLvl = cRemainingLevels - 1
     for cValue,listChildInst in dictInst.iteritems():
-        dtChild = build_tree_rec(setIxAttr, listChildInst, dblMinGain,cNextLvl)
-        dt.add(dtChild,cValue)
+        if fxnBuildChild is None:
+            dtChild = build_tree_rec(setIxAttr, listChildInst, dblMinGain,
+                                     cNextLvl, dictEntropy[cValue], bss)
+            dt.add(dtChild,cValue)
+        else:
+            fxnBuildChild(dt, cValue, setIxAttr, listChildInst, dblMinGain,
+                          cNextLvl, dictEntropy[cValue])
     setIxAttr.add(ixAttr)
     return dt
 
+def build_subtree(cAttrs, listIxAttr, listInst, dblMinGain,
+                  cRemainingLevels, dblEntropy, fxnBuildChild=None):
+    """Build a subtree with build_tree_rec over the attributes listIxAttr of
+    instances with cAttrs attributes."""
+    # narrowed down from all the attributes, as build_tree's set is, so that
+    # it iterates (and breaks ties between gains) in the same order
+    setIxAttr = set(xrange(cAttrs))
+    setIxAttr.difference_update(set(setIxAttr) - set(listIxAttr))
+    return build_tree_rec(setIxAttr, listInst, dblMinGain, cRemainingLevels,
+                          dblEntropy, fxnBuildChild=fxnBuildChild)
+
+def build_subtree_serialized(*args):
+    """Build a subtree with build_subtree and return pickled a pair of its
+    root and a list of (parent, value, child) triples, in the order
+    build_tree_rec built the children, which are left for the receiver to
+    add: unpickling a dictionary may reorder keys whose hashes collide.
+    This runs in worker processes for ParallelTreeBuilder."""
+    listChild = []
+    def build_child(dtParent, cValue, setIxAttr, listInst, dblMinGain,
+                    cRemainingLevels, dblEntropy):
+        dtChild = build_tree_rec(setIxAttr, listInst, dblMinGain,
+                                 cRemainingLevels, dblEntropy,
+                                 fxnBuildChild=build_child)
+        listChild.append((dtParent,cValue,dtChild))
+    dt = build_subtree(*args, fxnBuildChild=build_child)
+    return cPickle.dumps((dt,listChild), cPickle.HIGHEST_PROTOCOL)
+
+class ParallelTreeBuilder(object):
+    """Builds a decision tree as build_tree_rec does, sharing the work with
+    a process pool. This process keeps splitting every node with more than
+    cSplitMin instances; smaller subtrees are deferred. Once the split nodes
+    are done, the deferred subtrees with more than cParallelMin instances go
+    to the pool, largest first, while this process builds the rest. Every
+    child is then added to its parent, in the order build_tree_rec would
+    add it, so the tree is identical to build_tree_rec's."""
+    def __init__(self, pool, cAttrs, cParallelMin, cSplitMin):
+        self.pool = pool
+        self.cAttrs = cAttrs
+        self.cParallelMin = cParallelMin
+        self.cSplitMin = max(cSplitMin, cParallelMin)
+        self.listChild = []
+        self.listDeferred = []
+    def build_child(self, dtParent, cValue, setIxAttr, listInst, dblMinGain,
+                    cRemainingLevels, dblEntropy):
+        """The fxnBuildChild of build_tree_rec: split large nodes here, and
+        defer the subtrees of the rest. Each child is recorded as a list of
+        [its parent, its value, its subtree], the subtree being None until
+        it is built."""
+        listEntry = [dtParent, cValue, None]
+        self.listChild.append(listEntry)
+        if len(listInst) > self.cSplitMin:
+            listEntry[2] = build_tree_rec(setIxAttr, listInst, dblMinGain,
+                                          cRemainingLevels, dblEntropy,
+                                          fxnBuildChild=self.build_child)
+        else:
+            tplArgs = (self.cAttrs, list(setIxAttr), listInst, dblMinGain,
+                       cRemainingLevels, dblEntropy)
+            self.listDeferred.append((listEntry,tplArgs))
+    def build(self, listInst, dblMinGain, cMaxLevel):
+        """Build and return the tree of listInst."""
+        self.listChild = []
+        self.listDeferred = []
+        dt = build_tree_rec(set(xrange(self.cAttrs)), listInst, dblMinGain,
+                            cMaxLevel, fxnBuildChild=self.build_child)
+        self.listDeferred.sort(key=lambda (_,tplArgs): len(tplArgs[2]),
+                               reverse=True)
+        listPending = []
+        listLocal = []
+        for listEntry,tplArgs in self.listDeferred:
+            if len(tplArgs[2]) > self.cParallelMin:
+                oResult = self.pool.apply_async(build_subtree_serialized,
+                                                tplArgs)
+                listPending.append((listEntry,oResult))
+            else:
+                listLocal.append((listEntry,tplArgs))
+        for listEntry,tplArgs in listLocal:
+            listEntry[2] = build_subtree(*tplArgs)
+        for listEntry,oResult in listPending:
+            listEntry[2],listChild = cPickle.loads(oResult.get())
+            self.listChild.extend(listChild)
+        for dtParent,cValue,dtChild in self.listChild:
+            dtParent.add(dtChild, cValue)
+        self.listChild = []
+        self.listDeferred = []
+        return dt
+
 def count_instance_attributes(listInst):
     """Return the number of attributes across all instances, or None if the
     instances differ in the number of attributes they contain.
@@ -275,16 +761,117 @@ def count_instance_attributes(listInst):
             return None
     return cAttr
 
-def build_tree(listInst, dblMinGain=0.0, cMaxLevel=-1):
+def build_tree(listInst, dblMinGain=0.0, cMaxLevel=-1,
+               sBackend=BACKEND_PYTHON, fInPlace=False, cWorkers=0,
+               cParallelMin=PARALLEL_MIN_INSTANCES, fDedup=False, bss=None):
     """Build a decision tree with the ID3 algorithm from a list of
-    instances."""
+    instances or a Dataset.
+
+    sBackend selects how split gains are computed: BACKEND_PYTHON, or
+    BACKEND_NUMPY to score all candidate attributes with array arithmetic.
+    The numpy backend falls back to the pure-Python one when numpy is not
+    installed; it adds up weights in the same order and computes gains with
+    the same code (see count_rows_numpy), so it builds the same tree as
+    BACKEND_PYTHON, with or without fInPlace. BACKEND_BITSET
+    represents each node by a bitset of its rows (see BitsetIndex), and
+    builds the same tree as BACKEND_PYTHON; it ignores fInPlace.
+
+    If fInPlace is set, the tree is built over a single permutation array of
+    row indices which is partitioned in place at each node, with each child
+    receiving a range of it, so memory use does not grow with tree depth.
+    With the pure-Python backend rows within a child are not kept in order,
+    so for non-integral weights sums may round differently, and ties between
+    equally good attributes may be broken differently, than without
+    fInPlace.
+
+    If cWorkers is greater than one, subtrees with more than cParallelMin
+    instances are built in a pool of cWorkers processes (see
+    ParallelTreeBuilder); the tree is the same as a serial build. This
+    is only supported by the pure-Python backend without fInPlace.
+
+    If fDedup is set, the tree is built from the unique instances of listInst
+    (see dedup_instances), and their compression ratio is recorded in the
+    root's dblDedupRatio.
+
+    If bss, a BoundedSplitSearch, is given, splits are chosen by branch and
+    bound, and bss counts the attributes scored and skipped; the tree is the
+    same. This is only supported by the pure-Python backend without
+    fInPlace or cWorkers, and dataset-backed instances are read as
+    Instances."""
+    if sBackend not in (BACKEND_PYTHON, BACKEND_NUMPY, BACKEND_BITSET):
+        raise ValueError("Unknown backend %r" % (sBackend,))
+    if fDedup:
+        listInst,dblDedupRatio = dedup_instances(listInst)
+        dt = build_tree(listInst, dblMinGain, cMaxLevel, sBackend, fInPlace,
+                        cWorkers, cParallelMin, bss=bss)
+        dt.dblDedupRatio = dblDedupRatio
+        return dt
+    if bss is not None:
+        if sBackend != BACKEND_PYTHON or fInPlace or cWorkers > 1:
+            raise ValueError("bss requires the pure-Python backend without "
+                             "fInPlace or cWorkers.")
+        listInst = list(listInst)
+    if cWorkers > 1:
+        if sBackend != BACKEND_PYTHON or fInPlace:
+            raise ValueError("cWorkers requires the pure-Python backend "
+                             "without fInPlace.")
+        return build_tree_parallel(list(listInst), dblMinGain, cMaxLevel,
+                                   cWorkers, cParallelMin)
+    ds,rows = dataset_rows(listInst)
+    if sBackend == BACKEND_BITSET:
+        if ds is None:
+            ds = build_dataset(listInst)
+        elif isinstance(listInst, Dataset):
+            rows = None
+        bsi,bitsRows = bitset_index(ds, rows)
+        setIxAttr = set(xrange(ds.count_attributes()))
+        if not bitsRows:
+            raise AssertionError("cannot build a tree without instances")
+        return build_tree_bitset_rec(setIxAttr, bsi, bitsRows,
+                                     bitset_weigher(bsi), dblMinGain,
+                                     cMaxLevel)
+    if (sBackend == BACKEND_NUMPY and numpy is not None) or fInPlace:
+        if ds is None:
+            ds = build_dataset(listInst)
+            rows = xrange(len(ds))
+    if sBackend == BACKEND_NUMPY and numpy is not None:
+        setIxAttr = set(xrange(ds.count_attributes()))
+        arrIx = numpy.fromiter(rows, dtype=numpy.intp, count=len(rows))
+        return build_tree_numpy_rec(setIxAttr, NumpyColumns(ds), arrIx,
+                                    dblMinGain, cMaxLevel, fInPlace=fInPlace)
+    if fInPlace:
+        setIxAttr = set(xrange(ds.count_attributes()))
+        rr = RowRange(array.array("l", rows), 0, len(rows))
+        return build_tree_rows_rec(setIxAttr, ds, rr, dblMinGain, cMaxLevel,
+                                   fxnSeparate=partition_rows_in_place)
+    if ds is not None:
+        setIxAttr = set(xrange(ds.count_attributes()))
+        return build_tree_rows_rec(setIxAttr, ds, rows, dblMinGain, cMaxLevel)
     cAttr = count_instance_attributes(listInst)
     if cAttr is None:
         raise TypeError("Instances provided have attribute lists of "
                         "varying lengths.")
     setIxAttr = set(xrange(cAttr))
-    return build_tree_rec(setIxAttr, listInst, dblMinGain, cMaxLevel)
+    return build_tree_rec(setIxAttr, listInst, dblMinGain, cMaxLevel,
+                          bss=bss)
 build_tree.is_support = True
+
+def build_tree_parallel(listInst, dblMinGain, cMaxLevel, cWorkers,
+                        cParallelMin):
+    """Build a decision tree from a list of instances using a pool of
+    cWorkers processes."""
+    cAttr = count_instance_attributes(listInst)
+    if cAttr is None:
+        raise TypeError("Instances provided have attribute lists of "
+                        "varying lengths.")
+    cSplitMin = len(listInst) // (cWorkers*PARALLEL_TASKS_PER_WORKER)
+    pool = multiprocessing.Pool(cWorkers)
+    try:
+        ptb = ParallelTreeBuilder(pool, cAttr, cParallelMin, cSplitMin)
+        return ptb.build(listInst, dblMinGain, cMaxLevel)
+    finally:
+        pool.close()
+        pool.join()
         
 def classify(dt, inst):
     """Using decision tree dt, return the label for instance inst."""
@@ -295,6 +882,894 @@ def classify(dt, inst):
         return dt.fDefaultLabel
     return classify(dt.dictChildren[v], inst)
 
+def truncate(dt, cMaxLevel):
+    """Return a copy of dt cut off below level cMaxLevel, where the nodes at
+    that level become leaves labeled with their default labels. This is the
+    tree build_tree would have built with the same cMaxLevel; a negative
+    cMaxLevel leaves the tree whole.
+
+    >>> dt = DTree(ixAttr=0, fDefaultLabel=False)
+    >>> dt.add(DTree(fLabel=True), 1)
+    >>> truncate(dt, 0)
+    [F]"""
+    if dt.is_leaf():
+        return DTree(fLabel=dt.fLabel)
+    if cMaxLevel == 0:
+        return DTree(fLabel=dt.fDefaultLabel)
+    dtTruncated = DTree(ixAttr=dt.ixAttr, fDefaultLabel=dt.fDefaultLabel)
+    dtTruncated.dblGain = dt.dblGain
+    for cValue,dtChild in dt.dictChildren.iteritems():
+        dtTruncated.add(truncate(dtChild, cMaxLevel - 1), cValue)
+    return dtTruncated
+
+def apply_min_gain(dt, dblMinGain):
+    """Return a copy of dt in which every node whose recorded gain is not
+    greater than dblMinGain becomes a leaf labeled with its default label.
+    If dt was built with a lower dblMinGain, this is the tree build_tree
+    would have built with dblMinGain.
+
+    >>> dt = DTree(ixAttr=0, fDefaultLabel=False)
+    >>> dt.add(DTree(fLabel=True), 1)
+    >>> dt.dblGain = 0.25
+    >>> apply_min_gain(dt, 0.1), apply_min_gain(dt, 0.25)
+    (<0,F,{[T]}>, [F])"""
+    if dt.is_leaf():
+        return DTree(fLabel=dt.fLabel)
+    if dt.dblGain is None:
+        raise ValueError("apply_min_gain requires a tree with recorded gains")
+    if dt.dblGain <= dblMinGain:
+        return DTree(fLabel=dt.fDefaultLabel)
+    dtApplied = DTree(ixAttr=dt.ixAttr, fDefaultLabel=dt.fDefaultLabel)
+    dtApplied.dblGain = dt.dblGain
+    for cValue,dtChild in dt.dictChildren.iteritems():
+        dtApplied.add(apply_min_gain(dtChild, dblMinGain), cValue)
+    return dtApplied
+
+def classify_path(dt, inst):
+    """Return a pair of the list of the nodes inst passes through in dt, and
+    the label classify(dt, inst).
+
+    classify(truncate(dt, d), inst) is the default label of the d-th node of
+    the list, or the label of dt if the list has no more than d nodes."""
+    listNode = []
+    while not dt.is_leaf():
+        listNode.append(dt)
+        dt = dt.dictChildren.get(inst.listAttrs[dt.ixAttr])
+        if dt is None:
+            return listNode,listNode[-1].fDefaultLabel
+    return listNode,dt.fLabel
+
+def classify_depths(dt, inst, listDepth):
+    """Return the labels classify(truncate(dt, d), inst) for each depth d of
+    listDepth, walking dt only once."""
+    listNode,fLabel = classify_path(dt, inst)
+    return [listNode[d].fDefaultLabel if 0 <= d < len(listNode) else fLabel
+            for d in listDepth]
+
+def classify_min_gains(dt, inst, listDblMinGain):
+    """Return the labels classify(apply_min_gain(dt, g), inst) for each
+    minimum gain g of listDblMinGain, walking dt only once."""
+    listNode,fLabel = classify_path(dt, inst)
+    listLabel = []
+    for dblMinGain in listDblMinGain:
+        fLabelGain = fLabel
+        for dtNode in listNode:
+            if dtNode.dblGain <= dblMinGain:
+                fLabelGain = dtNode.fDefaultLabel
+                break
+        listLabel.append(fLabelGain)
+    return listLabel
+
+def separate_rows_by_attribute(ds, listIx, ixAttr):
+    """Build a dictionary mapping attribute values to lists of the rows in
+    listIx (indices into Dataset ds) which take that value.
+
+    >>> ds = build_dataset([Instance([5,0],True),Instance([9,0],True)])
+    >>> separate_rows_by_attribute(ds, [0,1], 0)
+    {9: [1], 5: [0]}"""
+    col = ds.listCol[ixAttr]
+    dictIx = {}
+    for ix in listIx:
+        cAttr = col[ix]
+        if cAttr not in dictIx:
+            dictIx[cAttr] = []
+        dictIx[cAttr].append(ix)
+    return dictIx
+
+def weight_true_false_rows(ds, listIx):
+    """Return the pair (true weight, false weight) summed over the rows in
+    listIx, in order."""
+    bitsLabel = ds.bitsLabel
+    arrWeight = ds.arrWeight
+    dblTWeight = dblFWeight = 0.0
+    for ix in listIx:
+        if bitsLabel[ix >> 3] & (1 << (ix & 7)):
+            dblTWeight += arrWeight[ix]
+        else:
+            dblFWeight += arrWeight[ix]
+    return dblTWeight,dblFWeight
+
+def compute_entropy_of_row_split(ds, dictIx):
+    """The row-index counterpart of compute_entropy_of_split."""
+    dblEntropy = 0.0
+    dblTotalWeight = 0.0
+    for listIx in dictIx.values():
+        dblTWeight,dblFWeight = weight_true_false_rows(ds, listIx)
+        dblLocalW = dblTWeight + dblFWeight
+        dblEntropy += compute_entropy(dblTWeight,dblFWeight)*dblLocalW
+        dblTotalWeight += dblLocalW
+    return dblEntropy/dblTotalWeight
+
+def count_rows_by_attribute(iterableIxAttr, ds, listIx):
+    """The row-index counterpart of count_by_attribute."""
+    listAttrCounts = [(ixAttr,{}) for ixAttr in iterableIxAttr]
+    listColCounts = [(ds.listCol[ixAttr],dictCount)
+                     for ixAttr,dictCount in listAttrCounts]
+    bitsLabel = ds.bitsLabel
+    arrWeight = ds.arrWeight
+    for ix in listIx:
+        ixLabel = (bitsLabel[ix >> 3] >> (ix & 7)) & 1
+        dblW = arrWeight[ix]
+        for col,dictCount in listColCounts:
+            cValue = col[ix]
+            listW = dictCount.get(cValue)
+            if listW is None:
+                listW = dictCount[cValue] = [0.0,0.0]
+            listW[ixLabel] += dblW
+    return listAttrCounts
+
+def compute_row_entropy(ds, listIx):
+    """The row-index counterpart of compute_list_entropy."""
+    return compute_entropy_of_row_split(ds, {None:listIx})
+
+def check_for_common_label_rows(ds, listIx):
+    """The row-index counterpart of check_for_common_label."""
+    fLabel = None
+    for ix in listIx:
+        if fLabel is None:
+            fLabel = ds.label(ix)
+        elif ds.label(ix) != fLabel:
+            return None
+    return fLabel
+
+def majority_label_rows(ds, listIx):
+    """The row-index counterpart of majority_label."""
+    dblT,dblF = weight_true_false_rows(ds, listIx)
+    return dblT > dblF
+
+class RowRange(object):
+    """A view of the row indices arrIx[ixStart:ixEnd] of a permutation array.
+    Iterating over a RowRange yields the row indices without copying them."""
+    def __init__(self, arrIx, ixStart, ixEnd):
+        self.arrIx = arrIx
+        self.ixStart = ixStart
+        self.ixEnd = ixEnd
+    def __len__(self):
+        return self.ixEnd - self.ixStart
+    def __iter__(self):
+        return itertools.imap(self.arrIx.__getitem__,
+                              xrange(self.ixStart, self.ixEnd))
+    def __repr__(self):
+        return "RowRange(%d, %d)" % (self.ixStart, self.ixEnd)
+
+class RowRangeList(object):
+    """Several RowRanges over the same permutation array, iterated in order
+    as one sequence of row indices."""
+    def __init__(self, listRowRange):
+        self.listRowRange = listRowRange
+    def __len__(self):
+        return sum([len(rr) for rr in self.listRowRange], 0)
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.listRowRange)
+
+class FoldView(object):
+    """A lazy, read-only view of the instances of listInst (a list of
+    instances or a Dataset) at the given rows (a RowRange or RowRangeList).
+    Iterating over the view yields the instances without copying them, or,
+    for a Dataset, Instance copies of its rows."""
+    def __init__(self, listInst, rows):
+        self.listInst = listInst
+        self.rows = rows
+    def __len__(self):
+        return len(self.rows)
+    def __iter__(self):
+        if isinstance(self.listInst, Dataset):
+            return itertools.imap(self.listInst.instance, self.rows)
+        return itertools.imap(self.listInst.__getitem__, self.rows)
+    def __getitem__(self, ix):
+        if ix < 0:
+            ix += len(self)
+        for ixRow in itertools.islice(self.rows, ix, None):
+            return self.listInst[ixRow]
+        raise IndexError("FoldView index out of range")
+    def __repr__(self):
+        return "FoldView(%d of %d instances)" % (len(self), len(self.listInst))
+
+def dataset_rows(listInst):
+    """If listInst is a Dataset or a FoldView of one, return the pair
+    (dataset, row indices). Otherwise, return (None,None)."""
+    if isinstance(listInst, Dataset):
+        return listInst,xrange(len(listInst))
+    if isinstance(listInst, FoldView) and isinstance(listInst.listInst,
+                                                     Dataset):
+        return listInst.listInst,listInst.rows
+    return None,None
+
+def partition_rows_in_place(ds, rr, ixAttr):
+    """Partition the rows of RowRange rr in place by their value of attribute
+    ixAttr, and return a dictionary mapping each value to the RowRange of
+    its rows.
+
+    Rows are swapped into place bucket by bucket (an American flag sort), so
+    no storage beyond the permutation array is used, but rows sharing a
+    value do not keep their relative order.
+
+    >>> ds = build_dataset([Instance([v],True) for v in [2,1,2,3,1]])
+    >>> rr = RowRange(array.array("l", range(5)), 0, 5)
+    >>> dictRange = partition_rows_in_place(ds, rr, 0)
+    >>> sorted((v,sorted(rrChild)) for v,rrChild in dictRange.items())
+    [(1, [1, 4]), (2, [0, 2]), (3, [3])]"""
+    col = ds.listCol[ixAttr]
+    arrIx = rr.arrIx
+    dictCount = {}
+    listValue = []
+    for ix in rr:
+        cValue = col[ix]
+        if cValue in dictCount:
+            dictCount[cValue] += 1
+        else:
+            dictCount[cValue] = 1
+            listValue.append(cValue)
+    dictNext = {}
+    dictRange = {}
+    ixPos = rr.ixStart
+    for cValue in listValue:
+        dictNext[cValue] = ixPos
+        dictRange[cValue] = RowRange(arrIx, ixPos, ixPos + dictCount[cValue])
+        ixPos += dictCount[cValue]
+    for cValue in listValue:
+        ixEnd = dictRange[cValue].ixEnd
+        ixPos = dictNext[cValue]
+        while ixPos < ixEnd:
+            ixRow = arrIx[ixPos]
+            cRowValue = col[ixRow]
+            if cRowValue == cValue:
+                ixPos += 1
+            else:
+                ixDest = dictNext[cRowValue]
+                arrIx[ixPos] = arrIx[ixDest]
+                arrIx[ixDest] = ixRow
+                dictNext[cRowValue] = ixDest + 1
+        dictNext[cValue] = ixPos
+    return dictRange
+
+def build_tree_rows_rec(setIxAttr, ds, listIx, dblMinGain, cRemainingLevels,
+                        dblEntropy=None,
+                        fxnSeparate=separate_rows_by_attribute,
+                        fxnCandidates=None):
+    """Recursively build a decision tree over the rows listIx of Dataset ds.
+
+    This follows build_tree_rec exactly, but reads attribute values, labels
+    and weights out of the dataset's columns rather than from Instance
+    objects, so both produce the same tree for the same data.
+
+    fxnSeparate(ds, listIx, ixAttr) splits a node's rows among its children;
+    passing partition_rows_in_place with a RowRange for listIx builds the
+    tree over a single permutation array instead of copying rows per level.
+
+    fxnCandidates(setIxAttr), if given, returns the attributes each node
+    chooses its split from, in place of all of setIxAttr (see
+    sample_attribute_subset)."""
+    assert listIx
+    fCommonLabel = check_for_common_label_rows(ds, listIx)
+    if fCommonLabel is not None:
+        return DTree(fLabel=fCommonLabel)
+    fMajority = majority_label_rows(ds, listIx)
+    if not setIxAttr or cRemainingLevels == 0:
+        return DTree(fLabel=fMajority)
+    if dblEntropy is None:
+        dblEntropy = compute_row_entropy(ds, listIx)
+    iterableIxAttr = setIxAttr
+    if fxnCandidates is not None:
+        iterableIxAttr = fxnCandidates(setIxAttr)
+    listAttrCounts = count_rows_by_attribute(iterableIxAttr, ds, listIx)
+    ixAttr,dictEntropy,dblGain = choose_split_with_gain(
+        listAttrCounts, dblEntropy, dblMinGain)
+    if ixAttr is None:
+        return DTree(fLabel=fMajority)
+
+    dt = DTree(ixAttr=ixAttr, fDefaultLabel=fMajority)
+    dt.dblGain = dblGain
+    dictIx = fxnSeparate(ds, listIx, ixAttr)
+    setIxAttr.remove(ixAttr)
+    cNextLvl = cRemainingLevels - 1
+    for cValue,listChildIx in dictIx.iteritems():
+        dtChild = build_tree_rows_rec(setIxAttr, ds, listChildIx, dblMinGain,
+                                      cNextLvl, dictEntropy[cValue],
+                                      fxnSeparate, fxnCandidates)
+        dt.add(dtChild,cValue)
+    setIxAttr.add(ixAttr)
+    return dt
+
+def sample_attribute_subset(cSubspace, rand, setIxAttr):
+    """Return cSubspace of the attributes in setIxAttr in increasing order,
+    sampled with random.Random rand (all of them if there are no more than
+    cSubspace). Partially applied, this is the fxnCandidates of
+    build_tree_rows_rec for random forests."""
+    listIxAttr = sorted(setIxAttr)
+    if cSubspace < len(listIxAttr):
+        listIxAttr = sorted(rand.sample(listIxAttr, cSubspace))
+    return listIxAttr
+
+def classify_row(dt, ds, ix):
+    """Using decision tree dt, return the label for row ix of Dataset ds."""
+    while dt.is_node():
+        v = ds.listCol[dt.ixAttr][ix]
+        if v not in dt.dictChildren:
+            return dt.fDefaultLabel
+        dt = dt.dictChildren[v]
+    return dt.fLabel
+
+class NumpyColumns(object):
+    """NumPy copies of a Dataset's columns for the numpy backend.
+
+    mxValue has one row per attribute, with each attribute's values shifted
+    (by arrValueMin) to start at zero; cSpan is one more than the largest
+    shifted value. Attributes are expected to take few distinct values, as
+    count arrays are sized by cSpan."""
+    def __init__(self, ds):
+        cLen = len(ds)
+        cAttr = ds.count_attributes()
+        self.mxValue = numpy.zeros((cAttr,cLen), dtype=numpy.intp)
+        self.arrValueMin = numpy.zeros(cAttr, dtype=numpy.intp)
+        for ixAttr,col in enumerate(ds.listCol):
+            arrValue = numpy.array(col, dtype=numpy.intp)
+            if cLen:
+                self.arrValueMin[ixAttr] = arrValue.min()
+            self.mxValue[ixAttr] = arrValue - self.arrValueMin[ixAttr]
+        self.cSpan = int(self.mxValue.max()) + 1 if self.mxValue.size else 1
+        arrBits = numpy.frombuffer(bytes(ds.bitsLabel), dtype=numpy.uint8)
+        arrIx = numpy.arange(cLen)
+        self.arrLabel = ((arrBits[arrIx >> 3] >> (arrIx & 7)) & 1).astype(
+            numpy.intp)
+        self.arrWeight = numpy.array(ds.arrWeight, dtype=numpy.float64)
+
+def count_rows_numpy(nc, arrIx, listIxAttr):
+    """The numpy counterpart of count_rows_by_attribute: return a list of
+    (attribute, count table) pairs for the rows arrIx, one per attribute of
+    listIxAttr, equal to those count_by_attribute builds.
+
+    The weighted label counts of every (attribute, value, label) triple come
+    from a single bincount over a combined key, which adds each row's weight
+    in row order, as count_by_attribute does. Values are entered in each
+    table in the order they are first seen, so that the tables iterate in
+    the same order too."""
+    cAttr = len(listIxAttr)
+    mxValue = nc.mxValue[numpy.ix_(listIxAttr, arrIx)]
+    arrOffset = numpy.arange(cAttr)*nc.cSpan
+    mxBin = mxValue + arrOffset[:,numpy.newaxis]
+    arrCount = numpy.bincount((mxBin*2 + nc.arrLabel[arrIx]).ravel(),
+                              weights=numpy.tile(nc.arrWeight[arrIx], cAttr),
+                              minlength=cAttr*nc.cSpan*2)
+    listCount = arrCount.reshape(cAttr*nc.cSpan, 2).tolist()
+    cBins = numpy.count_nonzero(numpy.bincount(mxBin.ravel()))
+    # every value usually appears within the first few rows, so only a
+    # growing prefix of the rows is searched for first appearances. The
+    # flattened prefix holds each attribute's row in turn, so ordering the
+    # bins by their first position orders them by attribute, then by first
+    # appearance.
+    cPrefix = 64
+    while True:
+        arrBin,arrFirst = numpy.unique(mxBin[:,:cPrefix].ravel(),
+                                       return_index=True)
+        if len(arrBin) == cBins or cPrefix >= len(arrIx):
+            break
+        cPrefix *= 4
+    listValueMin = [int(nc.arrValueMin[ixAttr]) for ixAttr in listIxAttr]
+    listAttrCounts = [(ixAttr,{}) for ixAttr in listIxAttr]
+    for cBin in arrBin[numpy.argsort(arrFirst)].tolist():
+        ixPos,cShifted = divmod(cBin, nc.cSpan)
+        cValue = cShifted + listValueMin[ixPos]
+        listAttrCounts[ixPos][1][cValue] = listCount[cBin]
+    return listAttrCounts
+
+def separate_rows_numpy(nc, arrIx, ixAttr, fInPlace=False):
+    """The numpy counterpart of separate_rows_by_attribute, mapping attribute
+    values to arrays of row indices. Values are inserted in the order they are
+    first seen and rows keep their order, as in the pure-Python path.
+
+    If fInPlace is set, arrIx is reordered in place and the returned arrays
+    are views into it."""
+    arrValue = nc.mxValue[ixAttr][arrIx]
+    arrUnique,arrFirst,arrCounts = numpy.unique(arrValue, return_index=True,
+                                                return_counts=True)
+    arrOrder = numpy.argsort(arrValue, kind="mergesort")
+    if fInPlace:
+        arrIx[:] = arrIx[arrOrder]
+        arrSorted = arrIx
+    else:
+        arrSorted = arrIx[arrOrder]
+    listChildIx = numpy.split(arrSorted, numpy.cumsum(arrCounts)[:-1])
+    cValueMin = int(nc.arrValueMin[ixAttr])
+    dictIx = {}
+    for ixUnique in numpy.argsort(arrFirst, kind="mergesort"):
+        dictIx[int(arrUnique[ixUnique]) + cValueMin] = listChildIx[ixUnique]
+    return dictIx
+
+def choose_split_attribute_numpy(iterableIxAttr, nc, arrIx, dblMinGain=0.0,
+                                 dblPrevEntropy=None, fInPlace=False):
+    """The numpy counterpart of choose_split_attribute. Returns a 4-tuple of
+    (the best attribute, a dictionary of the separated row index arrays,
+    a dictionary of the entropy of each partition, its gain), or
+    (None,None,None,None) if no attribute has a gain greater than
+    dblMinGain.
+
+    Gains are computed from count_rows_numpy's tables by the same code as
+    the pure-Python backend's, so both choose the same attribute."""
+    if dblPrevEntropy is None:
+        dblPrevEntropy = list_entropy_of_weights(
+            *weight_true_false_numpy(nc, arrIx))
+    listAttrCounts = count_rows_numpy(nc, arrIx, list(iterableIxAttr))
+    ixAttr,dictEntropy,dblGain = choose_split_with_gain(
+        listAttrCounts, dblPrevEntropy, dblMinGain)
+    if ixAttr is None:
+        return None,None,None,None
+    dictIx = separate_rows_numpy(nc, arrIx, ixAttr, fInPlace)
+    return ixAttr,dictIx,dictEntropy,dblGain
+
+def list_entropy_of_weights(dblTWeight, dblFWeight):
+    """Return compute_entropy of the given weights, rounded as
+    compute_list_entropy rounds it."""
+    dblWeight = dblTWeight + dblFWeight
+    return compute_entropy(dblTWeight,dblFWeight)*dblWeight/dblWeight
+
+def weight_true_false_numpy(nc, arrIx):
+    """Return the pair (true weight, false weight) of the rows arrIx, each
+    summed in row order."""
+    dblF,dblT = numpy.bincount(nc.arrLabel[arrIx], weights=nc.arrWeight[arrIx],
+                               minlength=2).tolist()
+    return dblT,dblF
+
+def build_tree_numpy_rec(setIxAttr, nc, arrIx, dblMinGain, cRemainingLevels,
+                         dblEntropy=None, fInPlace=False):
+    """The numpy counterpart of build_tree_rows_rec, over the rows arrIx of
+    NumpyColumns nc. If fInPlace is set, children are built over views of
+    arrIx, which is partitioned in place."""
+    assert len(arrIx)
+    arrLabel = nc.arrLabel[arrIx]
+    if arrLabel.min() == arrLabel.max():
+        return DTree(fLabel=bool(arrLabel[0]))
+    dblT,dblF = weight_true_false_numpy(nc, arrIx)
+    fMajority = dblT > dblF
+    if not setIxAttr or cRemainingLevels == 0:
+        return DTree(fLabel=fMajority)
+    if dblEntropy is None:
+        dblEntropy = list_entropy_of_weights(dblT,dblF)
+    ixAttr,dictIx,dictEntropy,dblGain = choose_split_attribute_numpy(
+        setIxAttr, nc, arrIx, dblMinGain, dblEntropy, fInPlace)
+    if ixAttr is None:
+        return DTree(fLabel=fMajority)
+
+    dt = DTree(ixAttr=ixAttr, fDefaultLabel=fMajority)
+    dt.dblGain = dblGain
+    setIxAttr.remove(ixAttr)
+    cNextLvl = cRemainingLevels - 1
+    for cValue,arrChildIx in dictIx.iteritems():
+        dtChild = build_tree_numpy_rec(setIxAttr, nc, arrChildIx, dblMinGain,
+                                       cNextLvl, dictEntropy[cValue],
+                                       fInPlace)
+        dt.add(dtChild,cValue)
+    setIxAttr.add(ixAttr)
+    return dt
+
+# build_tree_bitset_rec switches to row lists below this share of the rows
+BITSET_SPARSE_RATIO = 8
+
+# the positions of the set bits of each byte
+BYTE_BITS = [[ixBit for ixBit in xrange(8) if cByte >> ixBit & 1]
+             for cByte in xrange(256)]
+
+# for each byte, a str.translate table mapping it to "1" and every other
+# byte to "0"
+BYTE_MATCH_TABLES = ["0"*cByte + "1" + "0"*(255 - cByte)
+                     for cByte in xrange(256)]
+
+def bitset_from_rows(iterableIx):
+    """Return an integer with bit i set for each i in iterableIx.
+
+    >>> bitset_from_rows([0, 2, 9])
+    517L"""
+    bitsMap = bytearray()
+    for ix in iterableIx:
+        ixByte = ix >> 3
+        if ixByte >= len(bitsMap):
+            bitsMap.extend(bytearray(ixByte + 1 - len(bitsMap)))
+        bitsMap[ixByte] |= 1 << (ix & 7)
+    if not bitsMap:
+        return 0L
+    return long(binascii.hexlify(str(bitsMap[::-1])), 16)
+
+def rows_of_bitset(bits):
+    """Return the positions of the set bits of bits, in increasing order.
+
+    >>> rows_of_bitset(517L)
+    [0, 2, 9]"""
+    sHex = "%x" % bits
+    if len(sHex) & 1:
+        sHex = "0" + sHex
+    bitsMap = bytearray(binascii.unhexlify(sHex))
+    bitsMap.reverse()
+    listIx = []
+    for ixByte,cByte in enumerate(bitsMap):
+        if cByte:
+            ixBase = ixByte << 3
+            listIx.extend([ixBase + ixBit for ixBit in BYTE_BITS[cByte]])
+    return listIx
+
+def bitsets_by_value(listValue):
+    """Return a dict mapping each value of listValue to the bitset of its
+    positions. Lists of byte-sized values are matched a whole value at a
+    time with str.translate, rather than position by position.
+
+    >>> bitsets_by_value([2, 0, 2])
+    {0: 2L, 2: 5L}"""
+    if listValue and 0 <= min(listValue) and max(listValue) < 256:
+        # reversed, so that position 0 is the last, least significant, digit
+        sValues = str(bytearray(reversed(listValue)))
+        return dict((cValue, long(sValues.translate(BYTE_MATCH_TABLES[cValue]),
+                                  2))
+                    for cValue in set(listValue))
+    dictRows = {}
+    for ix,cValue in enumerate(listValue):
+        dictRows.setdefault(cValue, []).append(ix)
+    return dict((cValue, bitset_from_rows(listIx))
+                for cValue,listIx in dictRows.iteritems())
+
+# maps each byte to the byte counting its set bits
+POPCOUNT_TABLE = "".join(chr(bin(i).count("1")) for i in xrange(256))
+
+def popcount(bits):
+    """Return the number of set bits of bits.
+
+    >>> popcount(517L)
+    3"""
+    sHex = "%x" % bits
+    if len(sHex) & 1:
+        sHex = "0" + sHex
+    sCounts = binascii.unhexlify(sHex).translate(POPCOUNT_TABLE)
+    return sum([sCounts.count(chr(c))*c for c in xrange(1,9)])
+
+class BitsetIndex(object):
+    """Row membership bitsets for a sequence of rows of a Dataset, bit i
+    standing for the i-th row of the sequence. listAttrBits holds a dict for
+    each attribute mapping its values to the bitset of the rows taking them,
+    bitsTrue is the bitset of rows labeled true, and bitsAll that of all the
+    rows. arrOrder is the permutation array the rows were read from, if
+    any (see bitset_index)."""
+    def __init__(self, ds, iterableIx, arrOrder=None):
+        listIx = list(iterableIx)
+        self.ds = ds
+        self.listIx = listIx
+        self.arrOrder = arrOrder
+        self.bitsAll = (1L << len(listIx)) - 1
+        self.bitsTrue = bitsets_by_value([ds.label(ix)
+                                          for ix in listIx]).get(True, 0L)
+        self.listAttrBits = [bitsets_by_value([col[ix] for ix in listIx])
+                             for col in ds.listCol]
+
+def bitset_index(ds, rows):
+    """Return a pair of a BitsetIndex of rows of Dataset ds, and the bitset
+    of rows within it.
+
+    Rows made of increasing ranges of one permutation array, as the folds of
+    yield_cv_folds are, are found in an index over the whole array, so the
+    folds cut from it share one index; their bits are in the order of the
+    rows. That index, or one over all the rows of ds in order, is cached on
+    ds. Any other rows get an index of their own."""
+    if rows is None:
+        rows = xrange(len(ds))
+    listRowRange = (rows.listRowRange if isinstance(rows, RowRangeList)
+                    else [rows])
+    if (all([isinstance(rr, RowRange) for rr in listRowRange]) and
+        all([rr.arrIx is listRowRange[0].arrIx and rr.ixStart <= rr.ixEnd
+             for rr in listRowRange]) and
+        all([rrPrev.ixEnd <= rr.ixStart for rrPrev,rr
+             in zip(listRowRange, listRowRange[1:])])):
+        arrOrder = listRowRange[0].arrIx
+        if ds.bitsetIndex is None or ds.bitsetIndex.arrOrder is not arrOrder:
+            ds.bitsetIndex = BitsetIndex(ds, arrOrder, arrOrder)
+        bitsRows = 0L
+        for rr in listRowRange:
+            bitsRows |= ((1L << len(rr)) - 1) << rr.ixStart
+        return ds.bitsetIndex,bitsRows
+    if list(rows) != range(len(ds)):
+        bsi = BitsetIndex(ds, rows)
+        return bsi,bsi.bitsAll
+    if ds.bitsetIndex is None or ds.bitsetIndex.arrOrder is not None:
+        ds.bitsetIndex = BitsetIndex(ds, xrange(len(ds)))
+    return ds.bitsetIndex,ds.bitsetIndex.bitsAll
+
+def bitset_weigher(bsi):
+    """Return a function summing the current weights of the rows of a
+    bitset of BitsetIndex bsi, in the order of the rows. When all
+    the weights are the same power of two, such as 1.0, this is the
+    popcount times the weight, which is exact; otherwise the weights of the
+    set bits are added up one by one."""
+    arrWeight = bsi.ds.arrWeight
+    listWeight = [arrWeight[ix] for ix in bsi.listIx]
+    if (listWeight and math.frexp(listWeight[0])[0] == 0.5
+        and listWeight.count(listWeight[0]) == len(listWeight)):
+        dblWeight = listWeight[0]
+        return lambda bits: popcount(bits)*dblWeight
+    return lambda bits: sum([listWeight[ixBit]
+                             for ixBit in rows_of_bitset(bits)], 0.0)
+
+def count_bitset_by_attribute(iterableIxAttr, bsi, bits, fxnWeigh):
+    """The bitset counterpart of count_rows_by_attribute, over the rows of
+    bits. Returns a pair of the list of (attribute, count table) pairs and a
+    dict mapping each attribute to a dict from its values to bitsets; values
+    are inserted in the order in which they are first seen, so that the
+    dicts iterate as those of separate_rows_by_attribute do."""
+    listAttrCounts = []
+    dictAttrBits = {}
+    for ixAttr in iterableIxAttr:
+        listSeen = []
+        for cValue,bitsValue in bsi.listAttrBits[ixAttr].iteritems():
+            bitsChild = bits & bitsValue
+            if bitsChild:
+                listSeen.append((bitsChild & -bitsChild, cValue, bitsChild))
+        listSeen.sort()
+        dictCount = {}
+        dictBits = dictAttrBits[ixAttr] = {}
+        for _,cValue,bitsChild in listSeen:
+            bitsChildTrue = bitsChild & bsi.bitsTrue
+            dictCount[cValue] = [fxnWeigh(bitsChild ^ bitsChildTrue),
+                                 fxnWeigh(bitsChildTrue)]
+            dictBits[cValue] = bitsChild
+        listAttrCounts.append((ixAttr,dictCount))
+    return listAttrCounts,dictAttrBits
+
+def compute_bitset_entropy(bsi, bits, fxnWeigh):
+    """The bitset counterpart of compute_row_entropy."""
+    bitsTrue = bits & bsi.bitsTrue
+    dblTWeight,dblFWeight = fxnWeigh(bitsTrue),fxnWeigh(bits ^ bitsTrue)
+    dblWeight = dblTWeight + dblFWeight
+    return compute_entropy(dblTWeight,dblFWeight)*dblWeight/dblWeight
+
+def build_tree_bitset_rec(setIxAttr, bsi, bits, fxnWeigh, dblMinGain,
+                          cRemainingLevels, dblEntropy=None):
+    """The bitset counterpart of build_tree_rows_rec, over the rows of bits
+    in BitsetIndex bsi, whose weights are summed by fxnWeigh (see
+    bitset_weigher). The tree is the same as build_tree_rows_rec's.
+
+    Every bitset operation costs time in proportion to the number of rows
+    in bsi, however few of them a node holds, so nodes holding less than
+    one in BITSET_SPARSE_RATIO of the rows are handed to
+    build_tree_rows_rec."""
+    assert bits
+    if popcount(bits)*BITSET_SPARSE_RATIO < len(bsi.listIx):
+        listIx = [bsi.listIx[ixBit] for ixBit in rows_of_bitset(bits)]
+        return build_tree_rows_rec(setIxAttr, bsi.ds, listIx, dblMinGain,
+                                   cRemainingLevels, dblEntropy)
+    bitsTrue = bits & bsi.bitsTrue
+    if bitsTrue == bits or not bitsTrue:
+        return DTree(fLabel=bool(bitsTrue))
+    dblTWeight,dblFWeight = fxnWeigh(bitsTrue),fxnWeigh(bits ^ bitsTrue)
+    fMajority = dblTWeight > dblFWeight
+    if not setIxAttr or cRemainingLevels == 0:
+        return DTree(fLabel=fMajority)
+    if dblEntropy is None:
+        dblEntropy = compute_bitset_entropy(bsi, bits, fxnWeigh)
+    listAttrCounts,dictAttrBits = count_bitset_by_attribute(
+        setIxAttr, bsi, bits, fxnWeigh)
+    ixAttr,dictEntropy,dblGain = choose_split_with_gain(
+        listAttrCounts, dblEntropy, dblMinGain)
+    if ixAttr is None:
+        return DTree(fLabel=fMajority)
+
+    dt = DTree(ixAttr=ixAttr, fDefaultLabel=fMajority)
+    dt.dblGain = dblGain
+    setIxAttr.remove(ixAttr)
+    cNextLvl = cRemainingLevels - 1
+    for cValue,bitsChild in dictAttrBits[ixAttr].iteritems():
+        dtChild = build_tree_bitset_rec(setIxAttr, bsi, bitsChild, fxnWeigh,
+                                        dblMinGain, cNextLvl,
+                                        dictEntropy[cValue])
+        dt.add(dtChild,cValue)
+    setIxAttr.add(ixAttr)
+    return dt
+
+class CompiledTree(object):
+    """A DTree flattened into parallel arrays with one entry per node, the
+    root being node 0:
+    - arrIxAttr holds the split attribute of each node, or -1 for leaves.
+    - arrLabel holds the label of each leaf, and the default label of each
+      node, as 0 or 1.
+    - the children of node i are listed in the offset table arrChild: the
+      child for attribute value v is arrChild[arrChildBase[i] + v -
+      arrValueMin[i]] if 0 <= v - arrValueMin[i] < arrValueSpan[i], and a
+      -1 entry, or a value out of range, means the node has no such child.
+    Trees must split on integer attribute values."""
+    def __init__(self):
+        self.arrIxAttr = array.array("l")
+        self.arrLabel = array.array("b")
+        self.arrValueMin = array.array("l")
+        self.arrValueSpan = array.array("l")
+        self.arrChildBase = array.array("l")
+        self.arrChild = array.array("l")
+        self.tplNumpy = None
+    def numpy_arrays(self):
+        """Return (and cache) numpy copies of the node arrays, in the order
+        arrIxAttr, arrLabel, arrValueMin, arrValueSpan, arrChildBase,
+        arrChild."""
+        if self.tplNumpy is None:
+            self.tplNumpy = tuple([numpy.array(arr, dtype=numpy.intp)
+                                   for arr in (self.arrIxAttr, self.arrLabel,
+                                               self.arrValueMin,
+                                               self.arrValueSpan,
+                                               self.arrChildBase,
+                                               self.arrChild)])
+        return self.tplNumpy
+    def __len__(self):
+        return len(self.arrIxAttr)
+
+def compile_tree(dt):
+    """Flatten decision tree dt into a CompiledTree.
+
+    >>> dt = DTree(ixAttr=0, fDefaultLabel=False)
+    >>> dt.add(DTree(fLabel=True), 3)
+    >>> dt.add(DTree(fLabel=False), 5)
+    >>> ct = compile_tree(dt)
+    >>> list(ct.arrIxAttr), list(ct.arrChild)
+    ([0, -1, -1], [1, -1, 2])"""
+    ct = CompiledTree()
+    listDt = [dt]
+    ixNode = 0
+    while ixNode < len(listDt):
+        dtNode = listDt[ixNode]
+        ixNode += 1
+        if dtNode.is_leaf():
+            ct.arrIxAttr.append(-1)
+            ct.arrLabel.append(int(dtNode.fLabel))
+            ct.arrValueMin.append(0)
+            ct.arrValueSpan.append(0)
+            ct.arrChildBase.append(len(ct.arrChild))
+            continue
+        listValue = dtNode.dictChildren.keys()
+        for cValue in listValue:
+            if not isinstance(cValue, (int,long)):
+                raise TypeError("compile_tree requires integer attribute "
+                                "values, not %r" % (cValue,))
+        cValueMin = min(listValue) if listValue else 0
+        cValueSpan = max(listValue) - cValueMin + 1 if listValue else 0
+        ixChildBase = len(ct.arrChild)
+        ct.arrIxAttr.append(dtNode.ixAttr)
+        ct.arrLabel.append(int(dtNode.fDefaultLabel))
+        ct.arrValueMin.append(cValueMin)
+        ct.arrValueSpan.append(cValueSpan)
+        ct.arrChildBase.append(ixChildBase)
+        ct.arrChild.extend([-1]*cValueSpan)
+        for cValue,dtChild in dtNode.dictChildren.iteritems():
+            ct.arrChild[ixChildBase + cValue - cValueMin] = len(listDt)
+            listDt.append(dtChild)
+    return ct
+
+def classify_compiled(ct, listAttrs):
+    """Using CompiledTree ct, return the label for attribute values
+    listAttrs. This agrees with classify on the tree ct was compiled from
+    when the values are integers; any other value matches no child."""
+    arrIxAttr = ct.arrIxAttr
+    ixNode = 0
+    while True:
+        ixAttr = arrIxAttr[ixNode]
+        if ixAttr < 0:
+            return bool(ct.arrLabel[ixNode])
+        value = listAttrs[ixAttr]
+        if not isinstance(value, (int,long)):
+            return bool(ct.arrLabel[ixNode])
+        ixValue = value - ct.arrValueMin[ixNode]
+        if not 0 <= ixValue < ct.arrValueSpan[ixNode]:
+            return bool(ct.arrLabel[ixNode])
+        ixChild = ct.arrChild[ct.arrChildBase[ixNode] + ixValue]
+        if ixChild < 0:
+            return bool(ct.arrLabel[ixNode])
+        ixNode = ixChild
+
+def attribute_matrix_numpy(dataset):
+    """Return the attribute values of a list of instances, a Dataset or a
+    FoldView as a numpy integer array with one row per attribute, or None if
+    the values are not all integers or the instances are jagged."""
+    ds,rows = dataset_rows(dataset)
+    if ds is not None:
+        arrRow = numpy.fromiter(rows, dtype=numpy.intp, count=len(rows))
+        return numpy.array([numpy.array(col, dtype=numpy.intp)[arrRow]
+                            for col in ds.listCol], dtype=numpy.intp)
+    # built without a dtype, so that floats or strings are detected rather
+    # than cast to integers
+    try:
+        mxValue = numpy.array([inst.listAttrs for inst in dataset])
+    except (TypeError, ValueError):
+        return None
+    if mxValue.ndim != 2 or mxValue.dtype.kind != "i":
+        return None
+    return mxValue.astype(numpy.intp).T
+
+def classify_many_numpy(ct, mxValue):
+    """Classify every column of the attribute matrix mxValue (as built by
+    attribute_matrix_numpy) at once, moving all instances that are still
+    inside the tree down one level per step. Returns a boolean array."""
+    (arrIxAttr, arrLabel, arrValueMin, arrValueSpan, arrChildBase,
+     arrChild) = ct.numpy_arrays()
+    cInst = mxValue.shape[1]
+    arrResult = numpy.zeros(cInst, dtype=bool)
+    arrRow = numpy.arange(cInst)
+    arrNode = numpy.zeros(cInst, dtype=numpy.intp)
+    while len(arrRow):
+        arrAttr = arrIxAttr[arrNode]
+        arrIsLeaf = arrAttr < 0
+        arrResult[arrRow[arrIsLeaf]] = arrLabel[arrNode[arrIsLeaf]]
+        arrRow = arrRow[~arrIsLeaf]
+        arrNode = arrNode[~arrIsLeaf]
+        arrAttr = arrAttr[~arrIsLeaf]
+        arrValue = mxValue[arrAttr, arrRow] - arrValueMin[arrNode]
+        arrInRange = (arrValue >= 0) & (arrValue < arrValueSpan[arrNode])
+        arrNext = numpy.empty(len(arrRow), dtype=numpy.intp)
+        arrNext.fill(-1)
+        arrNext[arrInRange] = arrChild[arrChildBase[arrNode[arrInRange]] +
+                                       arrValue[arrInRange]]
+        arrIsMissing = arrNext < 0
+        arrResult[arrRow[arrIsMissing]] = arrLabel[arrNode[arrIsMissing]]
+        arrRow = arrRow[~arrIsMissing]
+        arrNode = arrNext[~arrIsMissing]
+    return arrResult
+
+def classify_many(ct, dataset, fUseNumpy=True):
+    """Using CompiledTree ct, return a list of the labels for every instance
+    in dataset (a list of instances, a Dataset or a FoldView), without
+    recursion or dictionary lookups. If numpy is available and fUseNumpy is
+    set, the whole batch is classified with array operations. Values which
+    are not integers match no child (see classify_many_tree)."""
+    if fUseNumpy and numpy is not None and len(dataset):
+        mxValue = attribute_matrix_numpy(dataset)
+        if mxValue is not None:
+            return classify_many_numpy(ct, mxValue).tolist()
+    ds,rows = dataset_rows(dataset)
+    if ds is not None:
+        return [classify_compiled(ct, ds.attrs(ix)) for ix in rows]
+    return [classify_compiled(ct, inst.listAttrs) for inst in dataset]
+
+def has_integer_values(dataset):
+    """Return whether every attribute value of dataset (a list of
+    instances, a Dataset or a FoldView) is an integer, so that compiled
+    trees classify it as classify does. A Dataset's values always are."""
+    if dataset_rows(dataset)[0] is not None:
+        return True
+    for inst in dataset:
+        for value in inst.listAttrs:
+            if not isinstance(value, (int,long)):
+                return False
+    return True
+
+def has_integer_splits(dt):
+    """Return whether every child of every node of dt is keyed by an
+    integer, as compile_tree requires."""
+    for cValue,dtChild in dt.dictChildren.iteritems():
+        if not isinstance(cValue, (int,long)) or not has_integer_splits(
+                dtChild):
+            return False
+    return True
+
+def classify_many_tree(dt, dataset, fIntegerValues=None):
+    """Return the labels classify gives every instance of dataset. They are
+    computed with classify_many if dt splits and dataset holds only integer
+    values, and one instance at a time otherwise. fIntegerValues may be
+    given if has_integer_values(dataset) is already known."""
+    if fIntegerValues is None:
+        fIntegerValues = has_integer_values(dataset)
+    if fIntegerValues and has_integer_splits(dt):
+        return classify_many(compile_tree(dt), dataset)
+    return [classify(dt, inst) for inst in dataset]
+
 class EvaluationResult(object):
     def __init__(self, listInstCorrect, listInstIncorrect, oClassifier):
         self.listInstCorrect = listInstCorrect
@@ -315,13 +1790,23 @@ def weight_correct_incorrect(rslt):
 
 class CrossValidationFold(object):
     """Abstract base class for all cross validaiton fold types."""
+    def build_params(self):
+        """Return a tuple of the parameters that build() depends on."""
+        return ()
     def build(self):
         # abstract method
         raise NotImplemented
     def classify(self, dt, inst):
         # abstract method
         raise NotImplemented
+    def classify_all(self, oCfer, listInst):
+        """Return a list of the labels of every instance in listInst.
+        Subclasses may override this with a batch classifier."""
+        return [self.classify(oCfer, inst) for inst in listInst]
     def check_insts(self, listInst):
+        if dataset_rows(listInst)[0] is not None:
+            # a Dataset cannot hold unlabeled rows
+            return listInst
         for inst in (listInst or []):
             if inst.fLabel is None:
                 raise TypeError("missing instance label")
@@ -334,26 +1819,82 @@ class TreeFold(CrossValidationFold):
         self.listInstTest = self.check_insts(listInstTest)
         self.listInstValidate = self.check_insts(listInstValidate)
         self.cMaxLevel = -1
+        self.sBackend = BACKEND_PYTHON
+        self.fDedup = False
+    def build_params(self):
+        return (self.cMaxLevel, self.sBackend, self.fDedup)
     def build(self):
-        return build_tree(self.listInstTraining, cMaxLevel=self.cMaxLevel)
+        return build_tree(self.listInstTraining, cMaxLevel=self.cMaxLevel,
+                          sBackend=self.sBackend, fDedup=self.fDedup)
     def classify(self, dt, inst):
         return classify(dt,inst)
-
-def evaluate_classification(cvf):
+    def classify_all(self, dt, listInst):
+        return classify_many_tree(dt, listInst)
+
+class FoldCache(object):
+    """A cache of the classifiers built for cross-validation folds, which
+    the scoring functions (such as cv_score) reuse when given one.
+
+    Classifiers are keyed on the type and build_params() of the fold and a
+    digest of the contents of its training (and validation) instances, in
+    order, so a fold only hits the cache if build() would see exactly the
+    same rows; changing the instances after a run simply misses it. At most
+    cMaxEntries classifiers are kept, the least recently used being dropped
+    first. Cached classifiers are shared between evaluations, so they
+    should not be modified."""
+    def __init__(self, cMaxEntries=32):
+        self.cMaxEntries = cMaxEntries
+        self.dictCfer = {}
+        self.listKey = []
+    def key(self, cvf):
+        sha = hashlib.sha1()
+        for listInst in (cvf.listInstTraining,
+                         getattr(cvf, "listInstValidate", None)):
+            sha.update("%d;" % len(listInst or []))
+            for inst in (listInst or []):
+                sha.update("%r %r %r;" % (inst.listAttrs, inst.fLabel,
+                                          inst.dblWeight))
+        return (type(cvf), cvf.build_params(), sha.digest())
+    def build(self, cvf):
+        """Return cvf.build(), or the classifier cached for an identical
+        fold."""
+        tplKey = self.key(cvf)
+        if tplKey in self.dictCfer:
+            self.listKey.remove(tplKey)
+            self.listKey.append(tplKey)
+            return self.dictCfer[tplKey]
+        oCfer = cvf.build()
+        self.dictCfer[tplKey] = oCfer
+        self.listKey.append(tplKey)
+        while len(self.listKey) > self.cMaxEntries:
+            del self.dictCfer[self.listKey.pop(0)]
+        return oCfer
+    def clear(self):
+        self.dictCfer.clear()
+        del self.listKey[:]
+
+def build_fold(cvf, fc=None):
+    """Return cvf.build(), through FoldCache fc if one is given."""
+    if fc is None:
+        return cvf.build()
+    return fc.build(cvf)
+
+def evaluate_classification(cvf, fc=None):
     """Given a CrossValidationFold, build a classifier and build an
     EvaluationResult that correctly partitions test instances into a list of
     correctly and incorrectly classified instances.
 
-    Classifiers can be built using cvf.build().
+    If a FoldCache fc is given, the classifier of an identical fold built
+    before is reused.
 
     Evaluation results are built with
     EvaluationResult(listInstCorrect,listInstIncorrect,dt)
     where dt is the classifier built with cvf.build()."""
-    dt = cvf.build()
+    dt = build_fold(cvf, fc)
     listInstCorrect = []
     listInstIncorrect = []
-    for inst in cvf.listInstTest:
-        fLabel = cvf.classify(dt,inst)
+    listLabel = cvf.classify_all(dt, cvf.listInstTest)
+    for inst,fLabel in itertools.izip(cvf.listInstTest, listLabel):
         if fLabel == inst.fLabel:
             listInstCorrect.append(inst)
         else:
@@ -379,33 +1920,206 @@ def check_folds(listInst, cFold, cMinFold):
     if cLen < cMinFold:
         raise ValueError("Need at least %s folds." % cMinFold)    
 
-def yield_cv_folds(listInst, cFold):
+def shuffled_indices(cLen, iSeed=None):
+    """Return an array holding a random permutation of 0..cLen-1. The
+    permutation is drawn from random.Random(iSeed) if a seed is given, and
+    from the random module's global state otherwise."""
+    listIx = range(cLen)
+    (random if iSeed is None else random.Random(iSeed)).shuffle(listIx)
+    return array.array("l", listIx)
+
+def yield_cv_folds(listInst, cFold, iSeed=None):
     """Yield a series of TreeFolds, which represent a partition of listInst
     into cFold folds.
 
+    listInst is neither copied nor reordered: folds hold FoldViews over a
+    shuffled permutation of its indices (see shuffled_indices for how iSeed
+    is used).
+
     You may either return a list, or `yield` (http://goo.gl/gwOfM)
     TreeFolds one at a time."""
-    random.shuffle(listInst)
     check_folds(listInst, cFold, 2)
-    cFoldSize = len(listInst)/cFold
+    cLen = len(listInst)
+    arrIx = shuffled_indices(cLen, iSeed)
+    cFoldSize = cLen/cFold
     for ixFold in xrange(cFold):
         ixFoldStart = ixFold*cFoldSize
         ixFoldEnd = ixFoldStart + cFoldSize
-        listInstTraining = listInst[:ixFoldStart] + listInst[ixFoldEnd:]
-        listInstTest = listInst[ixFoldStart:ixFoldEnd]
-        yield TreeFold(listInstTraining,listInstTest)
-
-def cv_score(iterableFolds):
+        rowsTraining = RowRangeList([RowRange(arrIx, 0, ixFoldStart),
+                                     RowRange(arrIx, ixFoldEnd, cLen)])
+        rowsTest = RowRange(arrIx, ixFoldStart, ixFoldEnd)
+        yield TreeFold(FoldView(listInst, rowsTraining),
+                       FoldView(listInst, rowsTest))
+
+def score_fold(cvf, fc=None):
+    """Evaluate a single fold, returning the (correct, incorrect) weight pair
+    of its test instances."""
+    return weight_correct_incorrect(evaluate_classification(cvf, fc))
+
+# the fold members which may hold FoldViews
+FOLD_VIEW_MEMBERS = ("listInstTraining", "listInstTest", "listInstValidate")
+
+class SharedFoldView(object):
+    """Stands in for a FoldView in a fold sent to a fold-scoring worker,
+    naming its instances and permutation arrays by their positions in the
+    lists the worker was started with (see detach_folds)."""
+    def __init__(self, ixSource, listRange, fRangeList):
+        self.ixSource = ixSource
+        self.listRange = listRange
+        self.fRangeList = fRangeList
+    def attach(self, listSource, listArrIx):
+        """Return the FoldView this stands for."""
+        listRowRange = [RowRange(listArrIx[ixArr], ixStart, ixEnd)
+                        for ixArr,ixStart,ixEnd in self.listRange]
+        if self.fRangeList:
+            rows = RowRangeList(listRowRange)
+        else:
+            rows = listRowRange[0]
+        return FoldView(listSource[self.ixSource], rows)
+
+def detach_folds(listFold):
+    """Return a triple of copies of the folds of listFold in which every
+    FoldView is replaced by a SharedFoldView, the list of the instance
+    sources they refer to, and the list of their permutation arrays. Each
+    source and array is listed once, however many folds share it."""
+    listSource = []
+    listArrIx = []
+    dictIx = {}
+    def position(obj, listObj):
+        if id(obj) not in dictIx:
+            dictIx[id(obj)] = len(listObj)
+            listObj.append(obj)
+        return dictIx[id(obj)]
+    listDetached = []
+    for cvf in listFold:
+        cvf = copy.copy(cvf)
+        for sMember in FOLD_VIEW_MEMBERS:
+            view = getattr(cvf, sMember, None)
+            if not isinstance(view, FoldView):
+                continue
+            fRangeList = isinstance(view.rows, RowRangeList)
+            listRowRange = (view.rows.listRowRange if fRangeList
+                            else [view.rows])
+            listRange = [(position(rr.arrIx, listArrIx), rr.ixStart,
+                          rr.ixEnd) for rr in listRowRange]
+            setattr(cvf, sMember,
+                    SharedFoldView(position(view.listInst, listSource),
+                                   listRange, fRangeList))
+        listDetached.append(cvf)
+    return listDetached,listSource,listArrIx
+
+# the instance sources and permutation arrays of a fold-scoring worker
+# process, set by init_fold_worker
+tplFoldWorkerShared = None
+
+def init_fold_worker(listSource, listArrIx):
+    global tplFoldWorkerShared
+    tplFoldWorkerShared = (listSource, listArrIx)
+
+def score_detached_fold(fxnScore, cvf):
+    """Restore the FoldViews of a fold made by detach_folds, in a
+    fold-scoring worker, and return fxnScore(cvf)."""
+    for sMember in FOLD_VIEW_MEMBERS:
+        view = getattr(cvf, sMember, None)
+        if isinstance(view, SharedFoldView):
+            setattr(cvf, sMember, view.attach(*tplFoldWorkerShared))
+    return fxnScore(cvf)
+
+def map_folds(fxnScore, iterableFolds, cWorkers=0, fc=None):
+    """Return an iterable of fxnScore applied to each fold, in fold order,
+    evaluated in a pool of cWorkers processes if cWorkers is greater than
+    one. FoldCache fc is passed to fxnScore in serial evaluation only, as a
+    pool's workers could not add to it; it is ignored if cWorkers is
+    greater than one.
+
+    The instances the folds view are handed to the pool's workers once,
+    when they start, so each task carries only the fold and its row ranges
+    (see detach_folds)."""
+    if cWorkers > 1:
+        listFold,listSource,listArrIx = detach_folds(iterableFolds)
+        pool = multiprocessing.Pool(cWorkers, init_fold_worker,
+                                    (listSource, listArrIx))
+        try:
+            return pool.map(functools.partial(score_detached_fold, fxnScore),
+                            listFold)
+        finally:
+            pool.close()
+            pool.join()
+    return itertools.imap(functools.partial(fxnScore, fc=fc), iterableFolds)
+
+def cv_score(iterableFolds, cWorkers=0, fc=None):
     """Determine the fraction (by weight) of correct instances across a number
-    of cross-validation folds."""
+    of cross-validation folds.
+
+    If cWorkers is greater than one, folds are evaluated concurrently in a
+    pool of cWorkers processes. The folds themselves are still generated in
+    this process, and their results are added up in fold order, so the score
+    is the same as a serial evaluation. Classifiers are reused through
+    FoldCache fc if one is given (see map_folds)."""
+    listPairs = map_folds(score_fold, iterableFolds, cWorkers, fc)
     dblCorrectTotal = dblWeightTotal = 0.0
-    for cvf in iterableFolds:
-        rslt = evaluate_classification(cvf)
-        dblCorrect,dblIncorrect = weight_correct_incorrect(rslt)
+    for dblCorrect,dblIncorrect in listPairs:
         dblCorrectTotal += dblCorrect
         dblWeightTotal += dblCorrect + dblIncorrect
     return dblCorrectTotal/dblWeightTotal
 
+def score_sweep(listInst, fxnLabels, cSweep):
+    """Return a list of cSweep (correct, incorrect) weight pairs of
+    listInst, where fxnLabels(inst) returns the cSweep labels of inst."""
+    listPairs = [[0.0, 0.0] for _ in xrange(cSweep)]
+    for inst in listInst:
+        for listPair,fLabel in itertools.izip(listPairs, fxnLabels(inst)):
+            listPair[0 if fLabel == inst.fLabel else 1] += inst.dblWeight
+    return map(tuple, listPairs)
+
+def cv_score_sweep(iterablePairLists):
+    """Given the (correct, incorrect) weight pairs of every setting of a
+    sweep for each fold, return the cv_score of every setting, adding up the
+    folds in order as cv_score does."""
+    listTotals = None
+    for listPairs in iterablePairLists:
+        if listTotals is None:
+            listTotals = [[0.0, 0.0] for _ in listPairs]
+        for listTotal,(dblCorrect,dblIncorrect) in zip(listTotals, listPairs):
+            listTotal[0] += dblCorrect
+            listTotal[1] += dblCorrect + dblIncorrect
+    return [dblCorrectTotal/dblWeightTotal
+            for dblCorrectTotal,dblWeightTotal in listTotals]
+
+def score_fold_depths(cvf, listDepth, fc=None):
+    """Build the unlimited-depth tree of TreeFold cvf once, and return a list
+    of the (correct, incorrect) weight pairs of its test instances for the
+    tree truncated at each depth of listDepth. cvf itself is not modified."""
+    cvfUnlimited = copy.copy(cvf)
+    cvfUnlimited.cMaxLevel = -1
+    dt = build_fold(cvfUnlimited, fc)
+    fxnLabels = lambda inst: classify_depths(dt, inst, listDepth)
+    return score_sweep(cvf.listInstTest, fxnLabels, len(listDepth))
+
+def cv_score_depths(iterableFolds, listDepth, cWorkers=0, fc=None):
+    """Return a list of the cv_score of iterableFolds, a sequence of
+    TreeFolds, for each maximum depth of listDepth (negative for unlimited),
+    building only one tree per fold. The scores equal those of folds whose
+    cMaxLevel is set to each depth."""
+    fxnScore = functools.partial(score_fold_depths, listDepth=listDepth)
+    return cv_score_sweep(map_folds(fxnScore, iterableFolds, cWorkers, fc))
+
+def score_fold_min_gains(cvf, listDblMinGain, fc=None):
+    """Build the tree of TreeFold cvf once, with a minimum gain of zero, and
+    return a list of the (correct, incorrect) weight pairs of its test
+    instances for the tree cut back to each minimum gain of listDblMinGain."""
+    dt = build_fold(cvf, fc)
+    fxnLabels = lambda inst: classify_min_gains(dt, inst, listDblMinGain)
+    return score_sweep(cvf.listInstTest, fxnLabels, len(listDblMinGain))
+
+def cv_score_min_gains(iterableFolds, listDblMinGain, cWorkers=0, fc=None):
+    """Return a list of the cv_score of iterableFolds, a sequence of
+    TreeFolds, for trees built with each non-negative minimum information
+    gain of listDblMinGain, building only one tree per fold."""
+    fxnScore = functools.partial(score_fold_min_gains,
+                                 listDblMinGain=listDblMinGain)
+    return cv_score_sweep(map_folds(fxnScore, iterableFolds, cWorkers, fc))
+
 def prune_tree(dt, listInst):
     """Recursively prune a decision tree.
 
@@ -413,35 +2127,71 @@ def prune_tree(dt, listInst):
     recursively prune the tree, then determine if the current node should
     become a leaf.
 
+    Each instance is routed down the tree once. Every node returns whether
+    its (pruned) subtree classifies each instance reaching it correctly, so
+    that its parent can score itself without classifying those instances
+    again. The scores are summed in the order of listInst, exactly as
+    classifying the instances at every node would.
+
     The function does not return anything, and instead modifies the tree
     in-place."""
+    ds,rows = dataset_rows(listInst)
+    if ds is not None:
+        listIx = list(rows)
+        fxnLabel = ds.label
+        listWeight = ds.arrWeight
+        fxnValue = lambda ix,ixAttr: ds.listCol[ixAttr][ix]
+    else:
+        listInst = list(listInst)
+        listIx = range(len(listInst))
+        fxnLabel = [inst.fLabel for inst in listInst].__getitem__
+        listWeight = [inst.dblWeight for inst in listInst]
+        fxnValue = lambda ix,ixAttr: listInst[ix].listAttrs[ixAttr]
+    prune_tree_rec(dt, listIx, fxnValue, fxnLabel, listWeight)
+
+def prune_tree_rec(dt, listIx, fxnValue, fxnLabel, listWeight):
+    """Prune dt in place using the rows listIx, where fxnValue(ix,ixAttr)
+    gives an attribute value, fxnLabel(ix) the label and listWeight[ix] the
+    weight of a row. Return a list of whether the pruned dt classifies each
+    row of listIx correctly."""
     if dt.is_leaf():
-        return
-    def score_tree():
-        dblScore = 0.0
-        for inst in listInst:
-            fLabel = classify(dt,inst)
-            if fLabel == inst.fLabel:
-                dblScore += inst.dblWeight
-        return dblScore
-    dictInst = separate_by_attribute(listInst,dt.ixAttr)
+        return [fxnLabel(ix) == dt.fLabel for ix in listIx]
+    dictIx = {}
+    listValue = []
+    for ix in listIx:
+        cValue = fxnValue(ix, dt.ixAttr)
+        listValue.append(cValue)
+        dictIx.setdefault(cValue, []).append(ix)
+    dictCorrect = {}
     for cVal,dtChild in dt.dictChildren.items():
-        if cVal in dictInst:
-            prune_tree(dtChild, dictInst[cVal])
-    dblBaseScore = score_tree()
-    dblDefaultClassWeight = sum([inst.dblWeight for inst in listInst
-                                 if inst.fLabel == dt.fDefaultLabel],0.0)
-    dblTotalWeight = sum([inst.dblWeight for inst in listInst],0.0)
+        if cVal in dictIx:
+            dictCorrect[cVal] = iter(prune_tree_rec(
+                dtChild, dictIx[cVal], fxnValue, fxnLabel, listWeight))
+    listCorrect = []
+    for ix,cValue in itertools.izip(listIx, listValue):
+        if cValue in dictCorrect:
+            listCorrect.append(next(dictCorrect[cValue]))
+        else:
+            listCorrect.append(fxnLabel(ix) == dt.fDefaultLabel)
+    dblBaseScore = 0.0
+    for ix,fCorrect in itertools.izip(listIx, listCorrect):
+        if fCorrect:
+            dblBaseScore += listWeight[ix]
+    dblDefaultClassWeight = sum([listWeight[ix] for ix in listIx
+                                 if fxnLabel(ix) == dt.fDefaultLabel], 0.0)
+    dblTotalWeight = sum([listWeight[ix] for ix in listIx], 0.0)
     dblPruneScore = dblDefaultClassWeight/dblTotalWeight
     if dblPruneScore >= dblBaseScore:
         dt.convert_to_leaf()
-        
-def build_pruned_tree(listInstTrain, listInstValidate):
+        return [fxnLabel(ix) == dt.fLabel for ix in listIx]
+    return listCorrect
+
+def build_pruned_tree(listInstTrain, listInstValidate, fDedup=False):
     """Build a pruned decision tree from a list of training instances, then
     prune the tree using a list of validation instances.
 
     Return the pruned decision tree."""
-    dt = build_tree(listInstTrain)
+    dt = build_tree(listInstTrain, fDedup=fDedup)
     prune_tree(dt,listInstValidate)
     return dt
 
@@ -452,28 +2202,33 @@ class PrunedFold(TreeFold):
             raise TypeError("PrunedCrossValidationFold requires "
                             "listInstValidate argument.")
     def build(self):
-        return build_pruned_tree(self.listInstTraining,self.listInstValidate)
+        return build_pruned_tree(self.listInstTraining,self.listInstValidate,
+                                 self.fDedup)
 
-def yield_cv_folds_with_validation(listInst, cFold):
+def yield_cv_folds_with_validation(listInst, cFold, iSeed=None):
     """Yield a number cFold of PrunedFolds, which together form a partition of
-    the list of instances listInst.
+    the list of instances listInst. As in yield_cv_folds, the folds hold
+    views of listInst, which is left unchanged.
 
     You may either return a list or yield successive values."""
-    random.shuffle(listInst)
     check_folds(listInst, cFold, 3)
-    cFoldSize = len(listInst)/cFold
+    cLen = len(listInst)
+    arrIx = shuffled_indices(cLen, iSeed)
+    cFoldSize = cLen/cFold
+    view = lambda ixStart,ixEnd: FoldView(listInst,
+                                          RowRange(arrIx, ixStart, ixEnd))
     for ixFold in xrange(cFold-1):
         ixTestStart = (ixFold)*cFoldSize
         ixTestEnd = ixTestStart + cFoldSize
         ixValidEnd = ixTestEnd + cFoldSize
-        listInstTraining = listInst[:ixTestStart] + listInst[ixValidEnd:]
-        listInstTest = listInst[ixTestStart:ixTestEnd]
-        listInstValidate = listInst[ixTestEnd:ixValidEnd]
-        yield PrunedFold(listInstTraining,listInstTest,
-                                        listInstValidate)
-    yield PrunedFold(listInst[cFoldSize:-cFoldSize],
-                                    listInst[-cFoldSize:],
-                                    listInst[:cFoldSize])
+        rowsTraining = RowRangeList([RowRange(arrIx, 0, ixTestStart),
+                                     RowRange(arrIx, ixValidEnd, cLen)])
+        yield PrunedFold(FoldView(listInst, rowsTraining),
+                         view(ixTestStart, ixTestEnd),
+                         view(ixTestEnd, ixValidEnd))
+    yield PrunedFold(view(cFoldSize, cLen - cFoldSize),
+                     view(cLen - cFoldSize, cLen),
+                     view(0, cFoldSize))
 
 def normalize_weights(listInst):
     """Normalize the weights of all the instances in listInst so that the sum
@@ -486,6 +2241,12 @@ def normalize_weights(listInst):
     >>> normalize_weights(listInst)
     >>> print listInst
     [Instance([], True, 0.25), Instance([], False, 0.75)]"""
+    if isinstance(listInst, Dataset):
+        arrWeight = listInst.arrWeight
+        dblTotalWeight = sum(arrWeight, 0.0)
+        for ix in xrange(len(arrWeight)):
+            arrWeight[ix] /= dblTotalWeight
+        return
     dblTotalWeight = sum([inst.dblWeight for inst in listInst], 0.0)
     for inst in listInst:
         inst.dblWeight /= dblTotalWeight
@@ -499,6 +2260,10 @@ def init_weights(listInst):
     >>> init_weights(listInst)
     >>> print listInst
     [Instance([], True, 0.50), Instance([], True, 0.50)]"""
+    if isinstance(listInst, Dataset):
+        listInst.arrWeight = array.array("d", [1.0]*len(listInst))
+        normalize_weights(listInst)
+        return
     for inst in listInst:
         inst.dblWeight = 1.0
     normalize_weights(listInst)
@@ -537,10 +2302,36 @@ class StumpFold(TreeFold):
     def build(self):
         return build_tree(self.listInstTraining, cMaxLevel=self.cMaxLevel)
 
-def one_round_boost(listInst, cMaxLevel):
+def select_trimmed(listWeight, dblTrim):
+    """Return the sorted indices of the fewest, heaviest weights of
+    listWeight which together hold at least the fraction dblTrim of its total
+    weight. Ties are broken by index. Raise ValueError unless dblTrim lies
+    in (0, 1].
+
+    >>> select_trimmed([0.1, 0.5, 0.05, 0.35], 0.8)
+    [1, 3]"""
+    if not 0.0 < dblTrim <= 1.0:
+        raise ValueError("dblTrim must lie in (0, 1], but was %r" % (dblTrim,))
+    dblTarget = dblTrim*sum(listWeight, 0.0)
+    listIx = []
+    dblWeight = 0.0
+    for ix in sorted(xrange(len(listWeight)), key=lambda ix: -listWeight[ix]):
+        if dblWeight >= dblTarget:
+            break
+        listIx.append(ix)
+        dblWeight += listWeight[ix]
+    listIx.sort()
+    return listIx
+
+def one_round_boost(listInst, cMaxLevel, dblTrim=1.0):
     """Conduct a single round of boosting on a list of instances. Returns a
     triple (classifier, error, classifier weight).
 
+    If dblTrim is less than one, the classifier is built only from the
+    heaviest instances holding that fraction of the weight (see
+    select_trimmed), but its error is measured on, and the weights updated
+    for, every instance.
+
     Implementation suggestion:
     - build a StumpFold from the list of instances and the given
       cMaxLevel (it's obnoxious that cMaxLevel has to be passed around
@@ -555,40 +2346,351 @@ def one_round_boost(listInst, cMaxLevel):
     - return the EvaluationResult's oClassifier member, the classifier error,
       and the classifier weight in a 3-tuple
     - remember to return early if the error is zero."""
-    sf = StumpFold(listInst, cMaxLevel)    
+    return one_round_boost_trimmed(listInst, cMaxLevel, dblTrim)[:3]
+
+def one_round_boost_trimmed(listInst, cMaxLevel, dblTrim=1.0):
+    """As one_round_boost, but return a 4-tuple whose last element is the
+    fraction of the instances left out of building the classifier."""
+    if isinstance(listInst, Dataset):
+        return one_round_boost_rows(listInst, cMaxLevel, dblTrim)
+    listInstTraining = listInst
+    if dblTrim < 1.0:
+        listIx = select_trimmed([inst.dblWeight for inst in listInst],
+                                dblTrim)
+        listInstTraining = [listInst[ix] for ix in listIx]
+    dblSkipped = 1.0 - len(listInstTraining)/float(len(listInst))
+    sf = StumpFold(listInstTraining, cMaxLevel)
+    sf.listInstTest = listInst
     rslt = evaluate_classification(sf)
     dblError = classifier_error(rslt)
     if dblError <= 0.0:
-        return rslt.oClassifier,dblError,0.0
+        return rslt.oClassifier,dblError,0.0,dblSkipped
     dblCferWeight = classifier_weight(dblError)
     for inst in rslt.listInstCorrect:
         update_weight_unnormalized(inst, dblCferWeight, inst.fLabel)
     for inst in rslt.listInstIncorrect:
         update_weight_unnormalized(inst, dblCferWeight, not inst.fLabel)
     normalize_weights(listInst)
-    return rslt.oClassifier,dblError,dblCferWeight
+    return rslt.oClassifier,dblError,dblCferWeight,dblSkipped
+
+def one_round_boost_rows(ds, cMaxLevel, dblTrim=1.0):
+    """The Dataset counterpart of one_round_boost_trimmed, reweighting the
+    rows of ds in place."""
+    arrWeight = ds.arrWeight
+    if dblTrim < 1.0:
+        listIx = select_trimmed(arrWeight, dblTrim)
+        dt = build_tree(FoldView(ds, listIx), cMaxLevel=cMaxLevel)
+        dblSkipped = 1.0 - len(listIx)/float(len(ds))
+    else:
+        dt = build_tree(ds, cMaxLevel=cMaxLevel)
+        dblSkipped = 0.0
+    listFCorrect = [classify_row(dt, ds, ix) == ds.label(ix)
+                    for ix in xrange(len(ds))]
+    dblCorrect = dblIncorrect = 0.0
+    for ix,fCorrect in enumerate(listFCorrect):
+        if fCorrect:
+            dblCorrect += arrWeight[ix]
+        else:
+            dblIncorrect += arrWeight[ix]
+    dblError = dblIncorrect/(dblCorrect+dblIncorrect)
+    if dblError <= 0.0:
+        return dt,dblError,0.0,dblSkipped
+    dblCferWeight = classifier_weight(dblError)
+    for ix,fCorrect in enumerate(listFCorrect):
+        dblFactor = 1.0 if fCorrect else -1.0
+        arrWeight[ix] *= math.exp(-dblCferWeight*dblFactor)
+    normalize_weights(ds)
+    return dt,dblError,dblCferWeight,dblSkipped
+
+class StumpHistogram(object):
+    """The training instances of a boosting run, grouped once by attribute
+    value and label, so that each round's weighted (attribute, value, label)
+    histogram is a sum over precomputed lists of rows.
+
+    listAttrRows pairs each attribute, in the order build_tree considers
+    them, with a dict mapping its values, in the order they are first seen,
+    to a pair of (false rows, true rows). The weights are kept in arrWeight
+    rather than in the instances, which are never modified."""
+    def __init__(self, listInst):
+        self.listIxFalse = []
+        self.listIxTrue = []
+        self.listAttrRows = []
+        for ix,inst in enumerate(listInst):
+            assert inst.fLabel is not None
+            if ix == 0:
+                setIxAttr = set(xrange(len(inst.listAttrs)))
+                self.listAttrRows = [(ixAttr,{}) for ixAttr in setIxAttr]
+            ixLabel = 1 if inst.fLabel else 0
+            (self.listIxTrue if inst.fLabel else self.listIxFalse).append(ix)
+            for ixAttr,dictRows in self.listAttrRows:
+                cValue = inst.listAttrs[ixAttr]
+                tplRows = dictRows.get(cValue)
+                if tplRows is None:
+                    tplRows = dictRows[cValue] = ([],[])
+                tplRows[ixLabel].append(ix)
+        self.cInst = len(self.listIxFalse) + len(self.listIxTrue)
+        self.arrWeight = array.array("d")
+
+    def init_weights(self, listDblWeight=None):
+        """Set the weights to listDblWeight, or all to one, normalized."""
+        if listDblWeight is None:
+            listDblWeight = [1.0]*self.cInst
+        self.arrWeight = array.array("d", listDblWeight)
+        dblTotalWeight = sum(self.arrWeight, 0.0)
+        for ix in xrange(self.cInst):
+            self.arrWeight[ix] /= dblTotalWeight
+
+    def sum_weights(self, listIx):
+        arrWeight = self.arrWeight
+        return sum([arrWeight[ix] for ix in listIx], 0.0)
+
+    def build_stump(self):
+        """Return the tree build_tree(listInst, cMaxLevel=1) would build under
+        the current weights, along with a list of whether it labels each row
+        correctly."""
+        listCorrect = [None]*self.cInst
+        if not self.listIxTrue or not self.listIxFalse:
+            return DTree(fLabel=bool(self.listIxTrue)),[True]*self.cInst
+        dblT = self.sum_weights(self.listIxTrue)
+        dblF = self.sum_weights(self.listIxFalse)
+        fMajority = dblT > dblF
+        # the same arithmetic as compute_list_entropy
+        dblWeight = dblT + dblF
+        dblEntropy = compute_entropy(dblT,dblF)*dblWeight/dblWeight
+        listAttrCounts = []
+        for ixAttr,dictRows in self.listAttrRows:
+            dictCount = {}
+            for cValue,(listIxF,listIxT) in dictRows.iteritems():
+                dictCount[cValue] = [self.sum_weights(listIxF),
+                                     self.sum_weights(listIxT)]
+            listAttrCounts.append((ixAttr,dictCount))
+        ixAttr,_,dblGain = choose_split_with_gain(listAttrCounts, dblEntropy)
+        if ixAttr is None:
+            for ix in self.listIxTrue:
+                listCorrect[ix] = fMajority
+            for ix in self.listIxFalse:
+                listCorrect[ix] = not fMajority
+            return DTree(fLabel=fMajority),listCorrect
+        dt = DTree(ixAttr=ixAttr, fDefaultLabel=fMajority)
+        dt.dblGain = dblGain
+        dictCount = dict(listAttrCounts)[ixAttr]
+        for cValue,(listIxF,listIxT) in dict(self.listAttrRows)[
+                ixAttr].iteritems():
+            if not listIxF:
+                fLabel = True
+            elif not listIxT:
+                fLabel = False
+            else:
+                dblFValue,dblTValue = dictCount[cValue]
+                fLabel = dblTValue > dblFValue
+            dt.add(DTree(fLabel=fLabel), cValue)
+            for ix in listIxT:
+                listCorrect[ix] = fLabel
+            for ix in listIxF:
+                listCorrect[ix] = not fLabel
+        return dt,listCorrect
+
+    def one_round(self):
+        """The StumpHistogram counterpart of one_round_boost with cMaxLevel
+        set to 1, reweighting arrWeight."""
+        dt,listCorrect = self.build_stump()
+        arrWeight = self.arrWeight
+        dblCorrect = dblIncorrect = 0.0
+        for dblW,fCorrect in itertools.izip(arrWeight, listCorrect):
+            if fCorrect:
+                dblCorrect += dblW
+            else:
+                dblIncorrect += dblW
+        dblError = dblIncorrect/(dblCorrect+dblIncorrect)
+        if dblError <= 0.0:
+            return dt,dblError,0.0
+        dblCferWeight = classifier_weight(dblError)
+        # the same factors update_weight_unnormalized applies
+        dblCorrectFactor = math.exp(-dblCferWeight*1.0)
+        dblIncorrectFactor = math.exp(-dblCferWeight*-1.0)
+        listWeight = [dblW*(dblCorrectFactor if fCorrect
+                            else dblIncorrectFactor)
+                      for dblW,fCorrect in itertools.izip(arrWeight,
+                                                          listCorrect)]
+        dblTotalWeight = sum(listWeight, 0.0)
+        self.arrWeight = array.array("d", [dblW/dblTotalWeight
+                                           for dblW in listWeight])
+        return dt,dblError,dblCferWeight
 
 class BoostResult(object):
-    def __init__(self, listDblCferWeight, listCfer):
+    """The classifiers of a boosting run and their weights. If boosting
+    stopped because a classifier had no error, that classifier alone is kept,
+    and brPrefix holds the BoostResult of the rounds before it.
+
+    listDblSkipped holds the fraction of the instances left out of building
+    the classifier of each round run, when boosting was trimmed.
+
+    listDblWeight holds the weights of the instances after the last round,
+    and fDone is set if boosting stopped before running out of rounds, so
+    that a result which is not done can be resumed for more rounds (see
+    boost). If boosting ran over deduplicated instances, dblDedupRatio holds
+    their compression ratio."""
+    def __init__(self, listDblCferWeight, listCfer, brPrefix=None):
         self.listDblCferWeight = listDblCferWeight
         self.listCfer = listCfer
-
-def boost(listInst, cMaxRounds=50, cMaxLevel=1):
-    """Conduct up to cMaxRounds of boosting on training instances listInst
-    and return a BoostResult containing the classifiers and their weights."""
+        self.brPrefix = brPrefix
+        self.listDblSkipped = []
+        self.listDblWeight = None
+        self.fDone = False
+        self.dblDedupRatio = None
+
+def get_weights(listInst):
+    """Return a list of the weights of a list of instances or a Dataset."""
+    if isinstance(listInst, Dataset):
+        return list(listInst.arrWeight)
+    return [inst.dblWeight for inst in listInst]
+
+def set_weights(listInst, listDblWeight):
+    """Set the weights of a list of instances or a Dataset from a list of
+    weights of the same length, in place."""
+    if len(listDblWeight) != len(listInst):
+        raise ValueError("Expected %d weights, but received %d"
+                         % (len(listInst), len(listDblWeight)))
+    if isinstance(listInst, Dataset):
+        listInst.arrWeight = array.array("d", listDblWeight)
+        return
+    for inst,dblWeight in itertools.izip(listInst, listDblWeight):
+        inst.dblWeight = dblWeight
+
+def save_checkpoint(br, sPath):
+    """Pickle BoostResult br to sPath. The pickle is written to a temporary
+    file which is then renamed over sPath, so that sPath always holds a
+    complete checkpoint even if the process dies while writing."""
+    sPathTmp = sPath + ".tmp"
+    outfile = open(sPathTmp, "wb")
+    try:
+        with outfile:
+            cPickle.dump(br, outfile, cPickle.HIGHEST_PROTOCOL)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+    except:
+        if os.path.exists(sPathTmp):
+            os.remove(sPathTmp)
+        raise
+    os.rename(sPathTmp, sPath)
+
+def load_checkpoint(sPath):
+    """Return the BoostResult saved to sPath by save_checkpoint."""
+    with open(sPath, "rb") as infile:
+        return cPickle.load(infile)
+
+def run_boost_rounds(fxnOneRound, fxnGetWeights, cMaxRounds, brResume,
+                     sCheckpoint, cCheckpointRounds, dblDedupRatio=None):
+    """Run the boosting loop shared by boost and boost_stumps, where
+    fxnOneRound() runs a round and returns a 4-tuple like
+    one_round_boost_trimmed, and fxnGetWeights() returns the current
+    instance weights. Rounds are added to those of brResume, if given, until
+    there are cMaxRounds of them. If sCheckpoint is given, the BoostResult
+    so far is saved there every cCheckpointRounds rounds, and at the end.
+    Every BoostResult built records dblDedupRatio."""
     listDblCferWeight = []
     listCfer = []
+    listDblSkipped = []
+    if brResume is not None:
+        listDblCferWeight.extend(brResume.listDblCferWeight)
+        listCfer.extend(brResume.listCfer)
+        listDblSkipped.extend(brResume.listDblSkipped)
+    def build_result(br, fDone):
+        br.listDblSkipped = list(listDblSkipped)
+        br.listDblWeight = fxnGetWeights()
+        br.fDone = fDone
+        br.dblDedupRatio = dblDedupRatio
+        if sCheckpoint is not None:
+            save_checkpoint(br, sCheckpoint)
+        return br
     dblError = -1.0 # impossible, to start the boosting loop
-    cRounds = 0
-    init_weights(listInst)
+    cRounds = len(listCfer)
     while dblError < 0.5 and cRounds < cMaxRounds:
-        dt,dblError,dblCferWeight = one_round_boost(listInst, cMaxLevel)
+        dt,dblError,dblCferWeight,dblSkipped = fxnOneRound()
+        listDblSkipped.append(dblSkipped)
         if dblError <= 0.0:
-            return BoostResult([1.0],[dt])
+            brPrefix = BoostResult(listDblCferWeight, listCfer)
+            return build_result(BoostResult([1.0],[dt],brPrefix), True)
         listCfer.append(dt)
         listDblCferWeight.append(dblCferWeight)
         cRounds += 1
-    return BoostResult(listDblCferWeight, listCfer)
+        if (sCheckpoint is not None and cRounds < cMaxRounds
+            and cRounds % cCheckpointRounds == 0):
+            build_result(BoostResult(list(listDblCferWeight), list(listCfer)),
+                         False)
+    return build_result(BoostResult(listDblCferWeight, listCfer),
+                        dblError >= 0.5)
+
+def boost(listInst, cMaxRounds=50, cMaxLevel=1, dblTrim=1.0, brResume=None,
+          sCheckpoint=None, cCheckpointRounds=10, fDedup=False):
+    """Conduct up to cMaxRounds of boosting on training instances listInst
+    and return a BoostResult containing the classifiers and their weights.
+
+    If dblTrim is less than one, each round's classifier is built from only
+    the heaviest instances holding that fraction of the weight; the
+    BoostResult's listDblSkipped records the fraction left out each round.
+
+    If brResume is given, boosting picks up where that earlier run over the
+    same instances left off, from its final weights, and runs until there
+    are cMaxRounds rounds in all; the result is the same as that of a
+    single run. If sCheckpoint is given, the result so far is saved to that
+    path every cCheckpointRounds rounds (see save_checkpoint).
+
+    If fDedup is set, boosting runs over the unique instances of listInst
+    (see dedup_instances), each starting with a weight proportional to its
+    number of duplicates, and the result's dblDedupRatio records their
+    compression ratio. The rounds match those over listInst up to rounding,
+    and the weights of listInst are left alone.
+
+    The weights of listInst are modified in place, except when it is a
+    FoldView of a Dataset, whose rows are copied first."""
+    dblDedupRatio = None
+    if fDedup:
+        listInst,dblDedupRatio = dedup_instances(listInst, fCount=True)
+    elif (not isinstance(listInst, Dataset)
+          and dataset_rows(listInst)[0] is not None):
+        listInst = copy_instances(listInst)
+    if brResume is None:
+        if fDedup:
+            normalize_weights(listInst)
+        else:
+            init_weights(listInst)
+    elif brResume.fDone:
+        return brResume
+    else:
+        set_weights(listInst, brResume.listDblWeight)
+    fxnOneRound = lambda: one_round_boost_trimmed(listInst, cMaxLevel,
+                                                  dblTrim)
+    return run_boost_rounds(fxnOneRound, lambda: get_weights(listInst),
+                            cMaxRounds, brResume, sCheckpoint,
+                            cCheckpointRounds, dblDedupRatio)
+
+def boost_stumps(listInst, cMaxRounds=50, brResume=None, sCheckpoint=None,
+                 cCheckpointRounds=10, fDedup=False):
+    """Boost decision stumps over listInst (a list of instances, a Dataset or
+    a FoldView) exactly as boost(listInst, cMaxRounds, 1) would, round for
+    round, but with the weights kept in a StumpHistogram: the instances are
+    neither copied nor modified. brResume, sCheckpoint, cCheckpointRounds
+    and fDedup are as for boost."""
+    listDblWeight = None
+    dblDedupRatio = None
+    if fDedup:
+        listInst,dblDedupRatio = dedup_instances(listInst, fCount=True)
+        listDblWeight = get_weights(listInst)
+    sh = StumpHistogram(listInst)
+    if brResume is None:
+        sh.init_weights(listDblWeight)
+    elif brResume.fDone:
+        return brResume
+    elif len(brResume.listDblWeight) != sh.cInst:
+        raise ValueError("Expected %d weights, but received %d"
+                         % (sh.cInst, len(brResume.listDblWeight)))
+    else:
+        sh.arrWeight = array.array("d", brResume.listDblWeight)
+    fxnOneRound = lambda: sh.one_round() + (0.0,)
+    return run_boost_rounds(fxnOneRound, lambda: list(sh.arrWeight),
+                            cMaxRounds, brResume, sCheckpoint,
+                            cCheckpointRounds, dblDedupRatio)
 
 def classify_boosted(br,inst):
     """Given a BoostResult and an instance, return the (boolean) label
@@ -600,27 +2702,425 @@ def classify_boosted(br,inst):
         dblScore += dblFactor * dblCferWeight
     return dblScore > 0.0
     
+class StumpTable(object):
+    """The votes of a boosted ensemble of stumps, summed by attribute.
+
+    dblBias is the vote of the stumps which are single leaves, and
+    dictScoreByAttr maps each attribute split on to a pair of a dict from
+    attribute value to summed vote, and the summed vote of the default
+    labels of those stumps, used for values not in the dict."""
+    def __init__(self, dblBias, dictScoreByAttr):
+        self.dblBias = dblBias
+        self.dictScoreByAttr = dictScoreByAttr
+
+    def score(self, listAttrs):
+        dblScore = self.dblBias
+        for ixAttr,(dictScore,dblDefault) in self.dictScoreByAttr.iteritems():
+            dblScore += dictScore.get(listAttrs[ixAttr], dblDefault)
+        return dblScore
+
+def compile_stumps(br):
+    """Collapse a BoostResult whose classifiers are all stumps (trees of
+    depth at most one) into a StumpTable, so that classifying an instance
+    costs one lookup per attribute no matter how many rounds were run.
+
+    The votes are summed in a different order than classify_boosted sums
+    them, so the two may disagree on instances whose score is within
+    rounding error of zero.
+
+    >>> dt = DTree(ixAttr=0, fDefaultLabel=True)
+    >>> dt.add(DTree(fLabel=False), 1)
+    >>> st = compile_stumps(BoostResult([0.5, 0.25], [dt, DTree(fLabel=True)]))
+    >>> st.dblBias, st.dictScoreByAttr
+    (0.25, {0: ({1: -0.5}, 0.5)})"""
+    dblBias = 0.0
+    dictStumps = {}
+    for dblCferWeight,dt in zip(br.listDblCferWeight, br.listCfer):
+        if dt.is_leaf():
+            dblBias += dblCferWeight if dt.fLabel else -dblCferWeight
+            continue
+        for dtChild in dt.dictChildren.itervalues():
+            if not dtChild.is_leaf():
+                raise ValueError("compile_stumps requires trees of depth 1")
+        dictStumps.setdefault(dt.ixAttr, []).append((dblCferWeight, dt))
+    dictScoreByAttr = {}
+    for ixAttr,listStump in dictStumps.iteritems():
+        setValue = set()
+        for _,dt in listStump:
+            setValue.update(dt.dictChildren)
+        dictScore = {}
+        for cValue in setValue:
+            dblScore = 0.0
+            for dblCferWeight,dt in listStump:
+                dtChild = dt.dictChildren.get(cValue)
+                fLabel = (dt.fDefaultLabel if dtChild is None
+                          else dtChild.fLabel)
+                dblScore += dblCferWeight if fLabel else -dblCferWeight
+            dictScore[cValue] = dblScore
+        dblDefault = 0.0
+        for dblCferWeight,dt in listStump:
+            dblDefault += (dblCferWeight if dt.fDefaultLabel
+                           else -dblCferWeight)
+        dictScoreByAttr[ixAttr] = (dictScore, dblDefault)
+    return StumpTable(dblBias, dictScoreByAttr)
+
+def copy_instances(listInst):
+    """Return a copy of a list of instances, a Dataset, or a FoldView whose
+    weights may be modified without affecting the original."""
+    if isinstance(listInst, Dataset):
+        return listInst.copy()
+    ds,rows = dataset_rows(listInst)
+    if ds is not None:
+        return ds.take(rows)
+    return [inst.copy() for inst in listInst]
+
+class CompiledBoostResult(object):
+    """A BoostResult whose classifiers have been compiled with compile_tree."""
+    def __init__(self, listDblCferWeight, listCompiled):
+        self.listDblCferWeight = listDblCferWeight
+        self.listCompiled = listCompiled
+
+def compile_boosted(br):
+    return CompiledBoostResult(list(br.listDblCferWeight),
+                               map(compile_tree, br.listCfer))
+
+def classify_many_boosted(cbr, dataset, fUseNumpy=True):
+    """Using CompiledBoostResult cbr, return a list of the labels of every
+    instance in dataset. Classifier votes are added up in the same order as
+    classify_boosted, so the labels agree with it exactly."""
+    listScore = [0.0]*len(dataset)
+    for dblCferWeight,ct in zip(cbr.listDblCferWeight, cbr.listCompiled):
+        listLabel = classify_many(ct, dataset, fUseNumpy)
+        for ix,fLabel in enumerate(listLabel):
+            listScore[ix] += dblCferWeight if fLabel else -dblCferWeight
+    return [dblScore > 0.0 for dblScore in listScore]
+
+def classify_boosted_all(br, dataset, fIntegerValues=None):
+    """Return the labels classify_boosted gives every instance of dataset,
+    computed with compiled classifiers where classify_many_tree would be."""
+    if fIntegerValues is None:
+        fIntegerValues = has_integer_values(dataset)
+    if fIntegerValues and all(map(has_integer_splits, br.listCfer)):
+        return classify_many_boosted(compile_boosted(br), dataset)
+    return [classify_boosted(br, inst) for inst in dataset]
+
+def truncate_boosted(br, cRounds):
+    """Return the BoostResult that boost would have returned with
+    cMaxRounds=cRounds, given the result br of boosting the same instances
+    for at least cRounds rounds."""
+    if br.brPrefix is not None:
+        if cRounds > len(br.brPrefix.listCfer):
+            return br
+        br = br.brPrefix
+    return BoostResult(br.listDblCferWeight[:cRounds], br.listCfer[:cRounds])
+
+def staged_classify_many(br, dataset, cRounds):
+    """Return a list of cRounds lists of labels, the r-th of which holds the
+    labels assigned to every instance of dataset by truncate_boosted(br, r+1).
+    Votes are accumulated one round at a time, in the order classify_boosted
+    adds them, so every stage is computed in a single pass over the rounds."""
+    brStaged = br if br.brPrefix is None else br.brPrefix
+    fIntegerValues = has_integer_values(dataset)
+    listScore = [0.0]*len(dataset)
+    listStages = []
+    listLabelFinal = None
+    for ixRound in xrange(cRounds):
+        if ixRound < len(brStaged.listCfer):
+            dblCferWeight = brStaged.listDblCferWeight[ixRound]
+            listLabel = classify_many_tree(brStaged.listCfer[ixRound],
+                                           dataset, fIntegerValues)
+            for ix,fLabel in enumerate(listLabel):
+                listScore[ix] += dblCferWeight if fLabel else -dblCferWeight
+            listStages.append([dblScore > 0.0 for dblScore in listScore])
+        else:
+            if listLabelFinal is None:
+                listLabelFinal = classify_boosted_all(br, dataset,
+                                                      fIntegerValues)
+            listStages.append(listLabelFinal)
+    return listStages
+
 class BoostedFold(TreeFold):
     def __init__(self, *args, **kwargs):
         super(BoostedFold,self).__init__(*args, **kwargs)
         self.cMaxLevel = 1
-        self.cMaxRounds = 50        
+        self.cMaxRounds = 50
+        self.dblTrim = 1.0
+    def build_params(self):
+        return (self.cMaxLevel, self.cMaxRounds, self.dblTrim, self.fDedup)
     def build(self):
-        listInst = [inst.copy() for inst in self.listInstTraining]
-        return boost(listInst, self.cMaxRounds, self.cMaxLevel)
+        if self.cMaxLevel == 1 and self.dblTrim >= 1.0:
+            return boost_stumps(self.listInstTraining, self.cMaxRounds,
+                                fDedup=self.fDedup)
+        listInst = self.listInstTraining
+        if not self.fDedup:
+            listInst = copy_instances(listInst)
+        return boost(listInst, self.cMaxRounds, self.cMaxLevel, self.dblTrim,
+                     fDedup=self.fDedup)
     def classify(self, br, inst):
         return classify_boosted(br, inst)
+    def classify_all(self, br, listInst):
+        return classify_boosted_all(br, listInst)
 
-def yield_boosted_folds(listInst, cFold):
+def yield_boosted_folds(listInst, cFold, iSeed=None):
     """Yield a number cFold of BoostedFolds, constituting a partition of
     listInst.
 
     Implementation suggestion: Generate TreeFolds, and yield BoostedFolds
     built from your TreeFolds."""
-    for cvf in yield_cv_folds(listInst, cFold):
+    for cvf in yield_cv_folds(listInst, cFold, iSeed):
         yield BoostedFold(cvf.listInstTraining, cvf.listInstTest)
 
-def read_csv_dataset(infile):
+def score_fold_staged(cvf, fc=None):
+    """Evaluate a BoostedFold after each of rounds 1..cvf.cMaxRounds, from a
+    single boosting run, returning a list of (correct, incorrect) weight
+    pairs."""
+    br = build_fold(cvf, fc)
+    listPairs = []
+    for listLabel in staged_classify_many(br, cvf.listInstTest,
+                                          cvf.cMaxRounds):
+        dblCorrect = dblIncorrect = 0.0
+        for inst,fLabel in itertools.izip(cvf.listInstTest, listLabel):
+            if fLabel == inst.fLabel:
+                dblCorrect += inst.dblWeight
+            else:
+                dblIncorrect += inst.dblWeight
+        listPairs.append((dblCorrect, dblIncorrect))
+    return listPairs
+
+def cv_score_staged(iterableFolds, cWorkers=0, fc=None):
+    """Return a list whose r-th element is the cv_score of iterableFolds, a
+    sequence of BoostedFolds sharing the same cMaxRounds, had they been
+    boosted for r+1 rounds. Each fold is boosted only once."""
+    return cv_score_sweep(map_folds(score_fold_staged, iterableFolds,
+                                    cWorkers, fc))
+
+class Forest(object):
+    """An ensemble of decision trees, each trained on a bootstrap sample of
+    the training instances, which vote on every label."""
+    def __init__(self, listTree):
+        self.listTree = listTree
+
+def share_dataset(ds):
+    """Return a copy of Dataset ds whose columns, labels and weights are held
+    in multiprocessing RawArrays, so that processes forked from this one read
+    the same memory rather than their own pickled copies."""
+    listCol = [multiprocessing.RawArray(col.typecode, col)
+               for col in ds.listCol]
+    bitsLabel = multiprocessing.RawArray("B", list(ds.bitsLabel))
+    arrWeight = multiprocessing.RawArray("d", ds.arrWeight)
+    return Dataset(listCol, bitsLabel, arrWeight)
+
+def build_forest_tree(ds, ixTree, iSeed, cSubspace, cMaxLevel, dblMinGain):
+    """Build tree number ixTree of a forest over Dataset ds. The bootstrap
+    sample and attribute subsets are drawn from a random.Random seeded with
+    (iSeed, ixTree), so the tree does not depend on the process building it.
+
+    The sample is expressed as weights, each row's weight multiplied by the
+    number of times it was drawn, over the columns of ds, which are never
+    copied."""
+    rand = random.Random(hash((iSeed, ixTree)))
+    cInst = len(ds)
+    listCount = [0]*cInst
+    for _ in xrange(cInst):
+        listCount[rand.randrange(cInst)] += 1
+    arrWeight = array.array("d", [cCount*dblW for cCount,dblW
+                                  in itertools.izip(listCount, ds.arrWeight)])
+    dsBag = Dataset(ds.listCol, ds.bitsLabel, arrWeight)
+    listIx = [ix for ix,cCount in enumerate(listCount) if cCount]
+    setIxAttr = set(xrange(ds.count_attributes()))
+    fxnCandidates = functools.partial(sample_attribute_subset, cSubspace, rand)
+    return build_tree_rows_rec(setIxAttr, dsBag, listIx, dblMinGain,
+                               cMaxLevel, fxnCandidates=fxnCandidates)
+
+# the shared Dataset of a forest-building worker process, set by
+# init_forest_worker
+dsForestWorker = None
+
+def init_forest_worker(ds):
+    global dsForestWorker
+    dsForestWorker = ds
+
+def build_forest_tree_in_worker(tplArgs):
+    return build_forest_tree(dsForestWorker, *tplArgs)
+
+def build_forest(listInst, cTrees=10, cSubspace=None, cMaxLevel=-1,
+                 dblMinGain=0.0, iSeed=None, cWorkers=0):
+    """Build a Forest of cTrees trees over listInst (a list of instances, a
+    Dataset or a FoldView), each from a bootstrap sample, choosing the split
+    of every node from a random subset of cSubspace attributes. cSubspace
+    defaults to the square root of the number of attributes; passing the
+    number of attributes gives plain bagging.
+
+    If cWorkers is greater than one, trees are built in a pool of cWorkers
+    processes which share one copy of the dataset (see share_dataset). The
+    forest depends only on iSeed, which is drawn from random if not given,
+    not on the number of workers. cWorkers is ignored in a daemonic process,
+    such as a worker of map_folds, as those cannot start a pool."""
+    ds,rows = dataset_rows(listInst)
+    if ds is None:
+        ds = build_dataset(listInst)
+    elif not isinstance(listInst, Dataset):
+        ds = ds.take(rows)
+    if cSubspace is None:
+        cSubspace = max(1, int(round(math.sqrt(ds.count_attributes()))))
+    if iSeed is None:
+        iSeed = random.getrandbits(32)
+    listArgs = [(ixTree, iSeed, cSubspace, cMaxLevel, dblMinGain)
+                for ixTree in xrange(cTrees)]
+    if cWorkers > 1 and not multiprocessing.current_process().daemon:
+        pool = multiprocessing.Pool(cWorkers, init_forest_worker,
+                                    (share_dataset(ds),))
+        try:
+            listTree = pool.map(build_forest_tree_in_worker, listArgs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        listTree = [build_forest_tree(ds, *tplArgs) for tplArgs in listArgs]
+    return Forest(listTree)
+
+def classify_forest(forest, inst):
+    """Return the label given to inst by a majority of the trees of forest,
+    or False on a tie."""
+    cTrue = sum([1 for dt in forest.listTree if classify(dt, inst)])
+    return 2*cTrue > len(forest.listTree)
+
+def classify_many_forest(forest, dataset):
+    """Return the labels classify_forest gives every instance of dataset,
+    classifying with compiled trees where classify_many_tree would."""
+    fIntegerValues = has_integer_values(dataset)
+    listVotes = [0]*len(dataset)
+    for dt in forest.listTree:
+        for ix,fLabel in enumerate(classify_many_tree(dt, dataset,
+                                                      fIntegerValues)):
+            if fLabel:
+                listVotes[ix] += 1
+    return [2*cTrue > len(forest.listTree) for cTrue in listVotes]
+
+class ForestFold(TreeFold):
+    def __init__(self, *args, **kwargs):
+        super(ForestFold,self).__init__(*args, **kwargs)
+        self.cTrees = 10
+        self.cSubspace = None
+        self.iSeed = None
+        self.cWorkers = 0
+    def build_params(self):
+        return (self.cMaxLevel, self.cTrees, self.cSubspace, self.iSeed)
+    def build(self):
+        return build_forest(self.listInstTraining, self.cTrees,
+                            self.cSubspace, self.cMaxLevel, iSeed=self.iSeed,
+                            cWorkers=self.cWorkers)
+    def classify(self, forest, inst):
+        return classify_forest(forest, inst)
+    def classify_all(self, forest, listInst):
+        return classify_many_forest(forest, listInst)
+
+def yield_forest_folds(listInst, cFold, iSeed=None):
+    """Yield a number cFold of ForestFolds, constituting a partition of
+    listInst.
+
+    Each fold's forest seed is derived from iSeed, or from a number drawn
+    from random here if it is not given, so the forests do not depend on
+    the process which builds them."""
+    iSeedForest = random.getrandbits(32) if iSeed is None else iSeed
+    for ixFold,cvf in enumerate(yield_cv_folds(listInst, cFold, iSeed)):
+        cvfForest = ForestFold(cvf.listInstTraining, cvf.listInstTest)
+        cvfForest.iSeed = hash((iSeedForest, ixFold))
+        yield cvfForest
+
+def append_tree_source(dt, listLine, cIndent):
+    """Append lines of Python source to listLine which return the label dt
+    assigns to the attribute list named attrs."""
+    sPad = "    "*cIndent
+    if dt.is_leaf():
+        listLine.append("%sreturn %r" % (sPad, dt.fLabel))
+        return
+    if dt.dictChildren:
+        listLine.append("%sv = attrs[%d]" % (sPad, dt.ixAttr))
+    sKeyword = "if"
+    for cValue,dtChild in sorted(dt.dictChildren.items()):
+        listLine.append("%s%s v == %r:" % (sPad, sKeyword, cValue))
+        append_tree_source(dtChild, listLine, cIndent + 1)
+        sKeyword = "elif"
+    listLine.append("%sreturn %r" % (sPad, dt.fDefaultLabel))
+
+def classifier_source(oModel, sName="classify_attrs"):
+    """Return the source of a Python function named sName which takes a list
+    of attribute values and returns the label assigned to them by oModel, a
+    DTree or a BoostResult, using nothing but nested if statements and
+    literals.
+
+    >>> dt = DTree(ixAttr=1, fDefaultLabel=False)
+    >>> dt.add(DTree(fLabel=True), 3)
+    >>> print classifier_source(dt)
+    def classify_attrs(attrs):
+        v = attrs[1]
+        if v == 3:
+            return True
+        return False
+    <BLANKLINE>"""
+    listLine = []
+    if isinstance(oModel, BoostResult):
+        listCall = []
+        for ixCfer,(dblCferWeight,dt) in enumerate(zip(
+                oModel.listDblCferWeight, oModel.listCfer)):
+            sCferName = "%s_cfer%d" % (sName, ixCfer)
+            listLine.append("def %s(attrs):" % sCferName)
+            append_tree_source(dt, listLine, 1)
+            listLine.append("")
+            listCall.append("    score += %r if %s(attrs) else %r"
+                            % (dblCferWeight, sCferName, -dblCferWeight))
+        listLine.append("def %s(attrs):" % sName)
+        listLine.append("    score = 0.0")
+        listLine.extend(listCall)
+        listLine.append("    return score > 0.0")
+    else:
+        listLine.append("def %s(attrs):" % sName)
+        append_tree_source(oModel, listLine, 1)
+    listLine.append("")
+    return "\n".join(listLine)
+
+# the functions generated by compile_classifier, keyed weakly on their
+# models so that the models stay picklable
+dictGeneratedClassifier = weakref.WeakKeyDictionary()
+
+def compile_classifier(oModel):
+    """Return a function of a list of attribute values generated from
+    oModel (see classifier_source). The function is cached for the model
+    (outside of it, so the model can still be pickled), so the model should
+    not be modified after it has been compiled.
+
+    >>> dt = DTree(ixAttr=0, fDefaultLabel=False)
+    >>> dt.add(DTree(fLabel=True), 3)
+    >>> fxnClassify = compile_classifier(dt)
+    >>> fxnClassify([3]), fxnClassify([4])
+    (True, False)"""
+    fxnGenerated = dictGeneratedClassifier.get(oModel)
+    if fxnGenerated is None:
+        sName = "classify_attrs"
+        sSource = classifier_source(oModel, sName)
+        dictNamespace = {}
+        code = compile(sSource, "<generated classifier>", "exec")
+        exec code in dictNamespace
+        fxnGenerated = dictNamespace[sName]
+        dictGeneratedClassifier[oModel] = fxnGenerated
+    return fxnGenerated
+
+def classify_generated(oModel, inst):
+    """Classify inst with the function generated from oModel, which agrees
+    with classify for a DTree, and classify_boosted for a BoostResult."""
+    return compile_classifier(oModel)(inst.listAttrs)
+
+def write_classifier_source(oModel, sPath, sName="classify_attrs"):
+    """Write a Python module to sPath defining the function sName generated
+    from oModel (see classifier_source). The module has no dependencies."""
+    with open(sPath, "w") as outfile:
+        outfile.write('"""Classifier generated by dtree.py."""\n\n')
+        outfile.write(classifier_source(oModel, sName))
+
+def read_csv_dataset(infile, fColumnar=False):
+    if fColumnar:
+        return read_csv_columns(infile)
     listInst = []
     for sRow in infile:
         listRow = map(int, sRow.strip().split())
@@ -629,12 +3129,453 @@ def read_csv_dataset(infile):
     return listInst
 read_csv_dataset.is_support = True
 
-def load_csv_dataset(oFile):
+def read_csv_columns(infile):
+    """Read a data file straight into a Dataset, without building an
+    Instance per row."""
+    listArrValue = None
+    listLabel = []
+    for sRow in infile:
+        listRow = map(int, sRow.strip().split())
+        if listArrValue is None:
+            listArrValue = [array.array("l") for _ in listRow[:-1]]
+        elif len(listRow) - 1 != len(listArrValue):
+            raise TypeError("Rows have attribute lists of varying lengths.")
+        for arrValue,cValue in zip(listArrValue, listRow):
+            arrValue.append(cValue)
+        listLabel.append(bool(listRow[-1]))
+    listCol = [pack_column(arrValue) for arrValue in (listArrValue or [])]
+    return Dataset(listCol, pack_labels(listLabel),
+                   array.array("d", [1.0]*len(listLabel)))
+read_csv_columns.is_support = True
+
+def load_csv_dataset(oFile, fColumnar=False):
+    """Load instances from a file name or open file, as a list of Instances
+    or, if fColumnar is set, as a Dataset."""
     if isinstance(oFile,basestring):
-        with open(oFile) as infile: return read_csv_dataset(infile)
-    return read_csv_dataset(infile)
+        with open(oFile) as infile:
+            return read_csv_dataset(infile, fColumnar)
+    return read_csv_dataset(oFile, fColumnar)
 load_csv_dataset.is_support = True
 
+def yield_csv_rows(oFile):
+    """Yield a pair of (attribute list, label) for each row of a data file,
+    given a file name or a seekable open file, which is rewound first."""
+    if isinstance(oFile,basestring):
+        with open(oFile) as infile:
+            for tplRow in yield_csv_rows(infile):
+                yield tplRow
+        return
+    oFile.seek(0)
+    for sRow in oFile:
+        listRow = map(int, sRow.strip().split())
+        yield listRow[:-1],bool(listRow[-1])
+yield_csv_rows.is_support = True
+
+class FrontierNode(object):
+    """The statistics of a node of a tree being built level by level (see
+    build_tree_streaming) whose split is not yet chosen: its number and
+    weight of each label, and the count table of each attribute it may
+    split on, in the form taken by choose_split_with_gain. dt is the
+    placeholder leaf which the node replaces in the tree once it is
+    resolved."""
+    def __init__(self, dt, listIxAttr, cRemainingLevels, dblEntropy=None):
+        self.dt = dt
+        self.listIxAttr = listIxAttr
+        self.cRemainingLevels = cRemainingLevels
+        self.dblEntropy = dblEntropy
+        self.cTrue = self.cFalse = 0
+        self.dblTWeight = self.dblFWeight = 0.0
+        self.listAttrCounts = [(ixAttr,{}) for ixAttr in listIxAttr]
+    def add(self, listAttrs, fLabel, dblWeight=1.0):
+        ixLabel = int(fLabel)
+        if fLabel:
+            self.cTrue += 1
+            self.dblTWeight += dblWeight
+        else:
+            self.cFalse += 1
+            self.dblFWeight += dblWeight
+        for ixAttr,dictCount in self.listAttrCounts:
+            cValue = listAttrs[ixAttr]
+            listW = dictCount.get(cValue)
+            if listW is None:
+                listW = dictCount[cValue] = [0.0,0.0]
+            listW[ixLabel] += dblWeight
+    def choose_split(self, dblMinGain):
+        """Return the split build_tree_rec would choose for the rows
+        counted, as a tuple of (the node's label or default label, and the
+        attribute, partition entropies and gain returned by
+        choose_split_with_gain). The attribute is None if the node is a
+        leaf."""
+        if not self.cTrue or not self.cFalse:
+            return bool(self.cTrue),None,None,None
+        fMajority = self.dblTWeight > self.dblFWeight
+        if not self.listIxAttr or self.cRemainingLevels == 0:
+            return fMajority,None,None,None
+        dblEntropy = self.dblEntropy
+        if dblEntropy is None:
+            dblWeight = self.dblTWeight + self.dblFWeight
+            dblEntropy = compute_entropy(self.dblTWeight,
+                                         self.dblFWeight)*dblWeight/dblWeight
+        ixAttr,dictEntropy,dblGain = choose_split_with_gain(
+            self.listAttrCounts, dblEntropy, dblMinGain)
+        return (fMajority,ixAttr,dictEntropy,dblGain)
+    def resolve(self, dblMinGain):
+        """Turn dt into a leaf or a split node, as build_tree_rec would for
+        the rows counted, and return the FrontierNodes of its children."""
+        fLabel,ixAttr,dictEntropy,dblGain = self.choose_split(dblMinGain)
+        if ixAttr is None:
+            self.dt.fLabel = fLabel
+            return []
+        return self.split(ixAttr, dblGain, dictEntropy)
+    def split(self, ixAttr, dblGain, dictEntropy=None):
+        """Turn dt into a node splitting on ixAttr, with a leaf labeled with
+        its majority label for each value counted, and return the
+        FrontierNodes of those leaves. dictEntropy maps values to the
+        entropies of the children, if they are known."""
+        dt = self.dt
+        fMajority = self.dblTWeight > self.dblFWeight
+        dt.fLabel = None
+        dt.ixAttr = ixAttr
+        dt.fDefaultLabel = fMajority
+        dt.dblGain = dblGain
+        listIxAttrChild = [ix for ix in self.listIxAttr if ix != ixAttr]
+        listFrontier = []
+        for cValue in dict(self.listAttrCounts)[ixAttr]:
+            dtChild = DTree(fLabel=fMajority)
+            dt.add(dtChild, cValue)
+            dblEntropy = None if dictEntropy is None else dictEntropy[cValue]
+            listFrontier.append(FrontierNode(dtChild, listIxAttrChild,
+                                             self.cRemainingLevels - 1,
+                                             dblEntropy))
+        return listFrontier
+
+def build_tree_streaming(oFile, dblMinGain=0.0, cMaxLevel=-1):
+    """Build a decision tree from a data file (a file name or a seekable open
+    file), reading it once per level of the tree rather than loading it.
+
+    Each pass routes every row down the tree built so far, as classify
+    does, and counts it into the FrontierNode it reaches; then the splits of
+    the whole frontier are chosen, giving the next level's frontier. Memory
+    is bounded by the count tables of one level, not by the size of the
+    file. As rows are counted in file order, the tree is the same as
+    build_tree(load_csv_dataset(oFile), dblMinGain, cMaxLevel)."""
+    dtRoot = DTree(fLabel=False)
+    listFrontier = None
+    while listFrontier is None or listFrontier:
+        dictFrontier = dict((id(fn.dt),fn) for fn in listFrontier or [])
+        for listAttrs,fLabel in yield_csv_rows(oFile):
+            if listFrontier is None:
+                listFrontier = [FrontierNode(dtRoot, range(len(listAttrs)),
+                                             cMaxLevel)]
+                dictFrontier[id(dtRoot)] = listFrontier[0]
+                cAttrs = len(listAttrs)
+            elif len(listAttrs) != cAttrs:
+                raise TypeError("Rows have attribute lists of varying "
+                                "lengths.")
+            dt = dtRoot
+            while dt.is_node():
+                dt = dt.dictChildren[listAttrs[dt.ixAttr]]
+            fn = dictFrontier.get(id(dt))
+            if fn is not None:
+                fn.add(listAttrs, fLabel)
+        if listFrontier is None:
+            raise ValueError("cannot build a tree from an empty file")
+        listFrontierNext = []
+        for fn in listFrontier:
+            listFrontierNext.extend(fn.resolve(dblMinGain))
+        listFrontier = listFrontierNext
+    return dtRoot
+
+def hoeffding_bound(dblDelta, cObservations):
+    """Return the Hoeffding bound on how far the mean of cObservations
+    observations of a quantity with range 1 (as the entropy of a boolean
+    label is) may lie from its true mean, with probability 1 - dblDelta.
+
+    >>> round(hoeffding_bound(0.05, 100), 4)
+    0.1224"""
+    return math.sqrt(math.log(1.0/dblDelta)/(2.0*cObservations))
+
+class HoeffdingTree(object):
+    """A decision tree learned from a stream of instances (a Hoeffding tree,
+    or VFDT), one instance at a time.
+
+    Each leaf keeps its label weights and attribute count tables in a
+    FrontierNode, and is labeled with its majority label. Every
+    cGracePeriod instances a leaf receives, the gains of its attributes are
+    computed as choose_split_with_gain does; the leaf splits on the best
+    attribute once its gain exceeds dblMinGain and either its lead over the
+    runner-up exceeds the Hoeffding bound for dblDelta and the number of
+    instances the leaf has received, whatever their weights, or the bound
+    falls below dblTieThreshold. A leaf at depth cMaxLevel never splits, and
+    its attributes are not counted.
+
+    Adding an instance takes time proportional to the depth of the tree
+    and the number of attributes, and memory is bounded by the count tables
+    of the leaves. dtRoot is the current model as a DTree, and may be
+    passed to classify at any time; tree() returns a copy which may be
+    modified, such as by prune_tree."""
+    def __init__(self, cAttrs, dblDelta=1e-6, dblTieThreshold=0.05,
+                 cGracePeriod=200, dblMinGain=0.0, cMaxLevel=-1):
+        self.dblDelta = dblDelta
+        self.dblTieThreshold = dblTieThreshold
+        self.cGracePeriod = cGracePeriod
+        self.dblMinGain = dblMinGain
+        self.dtRoot = DTree(fLabel=False)
+        self.dictLeaf = {}
+        # the attributes left to and the depth limit below each split node
+        self.dictNode = {}
+        self.add_leaf(FrontierNode(self.dtRoot, range(cAttrs), cMaxLevel))
+    def add_leaf(self, fn):
+        if fn.cRemainingLevels == 0:
+            fn.listIxAttr = []
+            fn.listAttrCounts = []
+        fn.cUnchecked = 0
+        self.dictLeaf[id(fn.dt)] = fn
+    def add(self, inst):
+        """Learn from inst, and return the leaf it reached."""
+        listAttrs = inst.listAttrs
+        dt = self.dtRoot
+        while dt.is_node():
+            cValue = listAttrs[dt.ixAttr]
+            dtChild = dt.dictChildren.get(cValue)
+            if dtChild is None:
+                dtChild = DTree(fLabel=dt.fDefaultLabel)
+                dt.add(dtChild, cValue)
+                listIxAttr,cRemainingLevels = self.dictNode[id(dt)]
+                self.add_leaf(FrontierNode(dtChild, listIxAttr,
+                                           cRemainingLevels))
+            dt = dtChild
+        fn = self.dictLeaf[id(dt)]
+        fn.add(listAttrs, inst.fLabel, inst.dblWeight)
+        if fn.dblTWeight != fn.dblFWeight:
+            dt.fLabel = fn.dblTWeight > fn.dblFWeight
+        fn.cUnchecked += 1
+        if fn.cUnchecked >= self.cGracePeriod:
+            fn.cUnchecked = 0
+            self.try_split(fn)
+        return dt
+    def add_many(self, iterableInst):
+        for inst in iterableInst:
+            self.add(inst)
+    def tree(self):
+        return self.dtRoot.copy()
+    def try_split(self, fn):
+        """Split the leaf of FrontierNode fn if the Hoeffding bound allows,
+        and return whether it was split."""
+        if not fn.listAttrCounts or not fn.dblTWeight or not fn.dblFWeight:
+            return False
+        dblPrevEntropy = compute_entropy(fn.dblTWeight, fn.dblFWeight)
+        listGain = []
+        for ixAttr,dictCount in fn.listAttrCounts:
+            dblEntropy,_ = compute_entropy_of_counts(dictCount)
+            listGain.append((dblPrevEntropy - dblEntropy, ixAttr))
+        listGain.sort(reverse=True)
+        dblBestGain,ixBest = listGain[0]
+        dblRunnerUp = listGain[1][0] if len(listGain) > 1 else 0.0
+        dblBound = hoeffding_bound(self.dblDelta, fn.cTrue + fn.cFalse)
+        if dblBestGain <= self.dblMinGain or (
+            dblBestGain - dblRunnerUp <= dblBound
+            and dblBound >= self.dblTieThreshold):
+            return False
+        dictCount = dict(fn.listAttrCounts)[ixBest]
+        del self.dictLeaf[id(fn.dt)]
+        listFrontier = fn.split(ixBest, dblBestGain)
+        self.dictNode[id(fn.dt)] = (listFrontier[0].listIxAttr,
+                                    listFrontier[0].cRemainingLevels)
+        for fnChild in listFrontier:
+            self.add_leaf(fnChild)
+        for cValue,dtChild in fn.dt.dictChildren.iteritems():
+            dblFWeight,dblTWeight = dictCount[cValue]
+            if dblTWeight != dblFWeight:
+                dtChild.fLabel = dblTWeight > dblFWeight
+        return True
+
+class IncrementalTree(object):
+    """A decision tree over a growing list of instances, revised in place
+    as instances are appended (in the manner of ID5R) rather than rebuilt.
+
+    Each split node caches the counts build_tree_rec chose its split from,
+    in a FrontierNode, and each leaf the indices of its instances. add_many
+    adds the new instances' counts along their paths; a node whose choice
+    of split attribute is unchanged keeps its subtree and passes the
+    instances on to its children, while a node whose choice changes, and
+    any leaf reached, is rebuilt from its instances. Counts are summed in
+    the order the instances were added, so dtRoot is always the tree
+    build_tree(listInst, dblMinGain, cMaxLevel) would build from all of
+    them.
+
+    dt may be given if it is already that tree for listInst. dtRoot, and
+    the subtrees within it, are replaced as the tree is revised, and should
+    not be modified; tree() returns a copy which may be."""
+    def __init__(self, listInst, dblMinGain=0.0, cMaxLevel=-1, dt=None):
+        self.listInst = list(listInst)
+        self.dblMinGain = dblMinGain
+        self.cMaxLevel = cMaxLevel
+        self.cAttrs = count_instance_attributes(self.listInst)
+        if self.cAttrs is None:
+            raise TypeError("Instances provided have attribute lists of "
+                            "varying lengths.")
+        if dt is None:
+            dt = build_tree(self.listInst, dblMinGain, cMaxLevel)
+        self.dtRoot = dt
+        # the FrontierNode of each split node, and the rows of each leaf
+        self.dictNode = {}
+        self.dictLeafRows = {}
+        self.index_subtree(dt, xrange(len(self.listInst)),
+                           range(self.cAttrs), cMaxLevel)
+    def tree(self):
+        return self.dtRoot.copy()
+    def index_subtree(self, dt, iterableIx, listIxAttr, cRemainingLevels):
+        """Count the rows iterableIx into the caches of the subtree dt."""
+        for ix in iterableIx:
+            inst = self.listInst[ix]
+            dtNode = dt
+            listIxAttrNode,cLevels = listIxAttr,cRemainingLevels
+            while dtNode.is_node():
+                fn = self.dictNode.get(id(dtNode))
+                if fn is None:
+                    fn = self.dictNode[id(dtNode)] = FrontierNode(
+                        dtNode, listIxAttrNode, cLevels)
+                fn.add(inst.listAttrs, inst.fLabel, inst.dblWeight)
+                listIxAttrNode = [ixAttr for ixAttr in fn.listIxAttr
+                                  if ixAttr != dtNode.ixAttr]
+                cLevels = fn.cRemainingLevels - 1
+                dtNode = dtNode.dictChildren[inst.listAttrs[dtNode.ixAttr]]
+            self.dictLeafRows.setdefault(id(dtNode), []).append(ix)
+    def unindex_subtree(self, dt):
+        """Drop the caches of the subtree dt, and return its rows."""
+        if dt.is_leaf():
+            return self.dictLeafRows.pop(id(dt))
+        del self.dictNode[id(dt)]
+        listIx = []
+        for dtChild in dt.dictChildren.itervalues():
+            listIx.extend(self.unindex_subtree(dtChild))
+        listIx.sort()
+        return listIx
+    def rebuild(self, listIx, listIxAttr, cRemainingLevels, dblEntropy):
+        """Build and index the subtree over the rows listIx."""
+        # built down from all the attributes, as build_tree's set is, so
+        # that it iterates (and breaks ties between gains) in the same order
+        setIxAttr = set(xrange(self.cAttrs))
+        setIxAttr.difference_update(set(setIxAttr) - set(listIxAttr))
+        dt = build_tree_rec(setIxAttr, [self.listInst[ix] for ix in listIx],
+                            self.dblMinGain, cRemainingLevels, dblEntropy)
+        self.index_subtree(dt, listIx, listIxAttr, cRemainingLevels)
+        return dt
+    def add_many(self, iterableInst):
+        """Append the instances of iterableInst, and revise the tree."""
+        listIxNew = []
+        for inst in iterableInst:
+            if len(inst.listAttrs) != self.cAttrs:
+                raise TypeError("Instance has the wrong number of "
+                                "attributes.")
+            listIxNew.append(len(self.listInst))
+            self.listInst.append(inst)
+        if listIxNew:
+            self.dtRoot = self.revise(self.dtRoot, listIxNew,
+                                      range(self.cAttrs), self.cMaxLevel)
+    def revise(self, dt, listIxNew, listIxAttr, cRemainingLevels,
+               dblEntropy=None):
+        """Revise the subtree dt for the new rows listIxNew, and return the
+        revised subtree (which is dt if it was not rebuilt)."""
+        if dt.is_leaf():
+            listIx = self.dictLeafRows.pop(id(dt)) + listIxNew
+            return self.rebuild(listIx, listIxAttr, cRemainingLevels,
+                                dblEntropy)
+        fn = self.dictNode[id(dt)]
+        for ix in listIxNew:
+            inst = self.listInst[ix]
+            fn.add(inst.listAttrs, inst.fLabel, inst.dblWeight)
+        fn.dblEntropy = dblEntropy
+        fMajority,ixAttr,dictEntropy,dblGain = fn.choose_split(
+            self.dblMinGain)
+        if ixAttr != dt.ixAttr:
+            listIx = self.unindex_subtree(dt) + listIxNew
+            return self.rebuild(listIx, listIxAttr, cRemainingLevels,
+                                dblEntropy)
+        dt.fDefaultLabel = fMajority
+        dt.dblGain = dblGain
+        listIxAttrChild = [ix for ix in listIxAttr if ix != ixAttr]
+        dictIxNew = {}
+        listValue = []
+        for ix in listIxNew:
+            cValue = self.listInst[ix].listAttrs[ixAttr]
+            if cValue not in dictIxNew:
+                dictIxNew[cValue] = []
+                listValue.append(cValue)
+            dictIxNew[cValue].append(ix)
+        for cValue in listValue:
+            dtChild = dt.dictChildren.get(cValue)
+            if dtChild is None:
+                dt.add(self.rebuild(dictIxNew[cValue], listIxAttrChild,
+                                    cRemainingLevels - 1,
+                                    dictEntropy[cValue]), cValue)
+            else:
+                dt.dictChildren[cValue] = self.revise(
+                    dtChild, dictIxNew[cValue], listIxAttrChild,
+                    cRemainingLevels - 1, dictEntropy[cValue])
+        return dt
+
+def build_tree_best_first(listInst, dblMinGain=0.0, cMaxLevel=-1,
+                          cMaxNodes=None, dblDeadline=None,
+                          dblMinWeightedGain=0.0):
+    """Build a decision tree best first: rather than growing depth first as
+    build_tree_rec does, keep a priority queue of the leaves which can be
+    split, ordered by the gain of their best split weighted by their share
+    of the total instance weight, and always split the leaf which gains the
+    most.
+
+    Growth stops once the queue is empty, which gives the tree build_tree
+    would, or once one of these budgets is spent:
+    - cMaxNodes, the number of nodes and leaves in the tree; splits which
+      would take the tree past it are passed over.
+    - dblDeadline, a time.time() value past which no leaf is split.
+    - dblMinWeightedGain, which the weighted gain of a split must exceed.
+    At every point the leaves are labeled with their majority labels, so
+    the tree returned is always usable."""
+    listInst = list(listInst)
+    if not listInst:
+        raise ValueError("cannot build a tree without instances")
+    cAttr = count_instance_attributes(listInst)
+    if cAttr is None:
+        raise TypeError("Instances provided have attribute lists of "
+                        "varying lengths.")
+    dblTotalWeight = 0.0
+    for inst in listInst:
+        dblTotalWeight += inst.dblWeight
+    dtRoot = DTree(fLabel=False)
+    listHeap = []
+    iterCount = itertools.count()
+    def push(fn, listInstLeaf):
+        for inst in listInstLeaf:
+            fn.add(inst.listAttrs, inst.fLabel, inst.dblWeight)
+        fLabel,ixAttr,dictEntropy,dblGain = fn.choose_split(dblMinGain)
+        fn.dt.fLabel = fLabel
+        if ixAttr is None:
+            return
+        dblWeightedGain = (dblGain*(fn.dblTWeight + fn.dblFWeight)/
+                           dblTotalWeight)
+        if dblWeightedGain > dblMinWeightedGain:
+            heapq.heappush(listHeap, (-dblWeightedGain, iterCount.next(), fn,
+                                      listInstLeaf, ixAttr, dblGain,
+                                      dictEntropy))
+    push(FrontierNode(dtRoot, range(cAttr), cMaxLevel), listInst)
+    cNodes = 1
+    while listHeap:
+        if dblDeadline is not None and time.time() >= dblDeadline:
+            break
+        _,_,fn,listInstLeaf,ixAttr,dblGain,dictEntropy = heapq.heappop(
+            listHeap)
+        listValue = list(dict(fn.listAttrCounts)[ixAttr])
+        if cMaxNodes is not None and cNodes + len(listValue) > cMaxNodes:
+            continue
+        cNodes += len(listValue)
+        dictInst = separate_by_attribute(listInstLeaf, ixAttr)
+        listFrontier = fn.split(ixAttr, dblGain, dictEntropy)
+        for cValue,fnChild in zip(listValue, listFrontier):
+            push(fnChild, dictInst[cValue])
+    return dtRoot
+
 def main(argv):
     import doctest
     doctest.testmod()
@@ -4,11 +4,14 @@
 dttasks.py -- problem set tasks for the CS181 decision tree problem set
 """
 
+import multiprocessing
 from os import path
 
 from tfutils import tftask
 import dtree
 
+CV_WORKERS = multiprocessing.cpu_count()
+
 def serialize_tree(dtRoot):
     listSrcDestValue = []
     cNodes = 0
@@ -115,24 +118,35 @@ class BcwCrossValidateTask(tftask.ChartTask):
                 "evaluate their performance through 10-fold cross validation.")
     def get_priority(self):
         return 1
-    def build_depth_yield(self,iDepth):
-        def yield_cv_folds(listInst,cFold):
-            for cvf in dtree.yield_cv_folds(listInst,cFold):
-                cvf.cMaxLevel = iDepth
-                yield cvf
-        return yield_cv_folds
     def task(self):
         listInstClean = dtree.load_csv_dataset(datadir("data.csv"))
         listInstNoisy = dtree.load_csv_dataset(datadir("noisy.dat"))
         cFold = 10
         listSeries = []
-        for sLbl,fxn in [("Unpruned", dtree.yield_cv_folds),
+        # unpruned trees, stumps and depth-2 trees are all truncations of
+        # one unlimited-depth tree per fold
+        listDepthLbl = [("Unpruned", -1), ("Stumps", 1), ("Depth-2", 2)]
+        listDepth = [iDepth for _,iDepth in listDepthLbl]
+        listDepthData = [dtree.cv_score_depths(
+                dtree.yield_cv_folds(listInst,cFold), listDepth,
+                cWorkers=CV_WORKERS)
+                         for listInst in (listInstClean, listInstNoisy)]
+        dictDepthSeries = {}
+        for ixDepth,(sLbl,_) in enumerate(listDepthLbl):
+            dictDepthSeries[sLbl] = [listData[ixDepth]
+                                     for listData in listDepthData]
+        for sLbl,fxn in [("Unpruned", None),
                          ("Pruned", dtree.yield_cv_folds_with_validation),
                          ("Boosted", dtree.yield_boosted_folds),
-                         ("Stumps", self.build_depth_yield(1)),
-                         ("Depth-2", self.build_depth_yield(2))]:
+                         ("Stumps", None),
+                         ("Depth-2", None)]:
+            if fxn is None:
+                listSeries.append({"name": sLbl,
+                                   "data": dictDepthSeries[sLbl]})
+                continue
             try:
-                fxnScore = lambda listInst: dtree.cv_score(fxn(listInst,cFold))
+                fxnScore = lambda listInst: dtree.cv_score(
+                    fxn(listInst,cFold), cWorkers=CV_WORKERS)
                 listData = [fxnScore(listInstClean), fxnScore(listInstNoisy)]
                 dictSeries = {"name": sLbl, "data": listData}
             except NotImplementedError:
@@ -199,11 +213,12 @@ class BcwCompareBoostingParameters(tftask.ChartTask):
                 "of rounds, and with different weak learners.")
     def get_priority(self):
         return 3.5
-    def build_fold_generator(self, cMaxLevel, cMaxRounds):
+    def build_fold_generator(self, cMaxLevel, cMaxRounds, dblTrim=1.0):
         def yield_folds(listInst,cFold):
             for cvf in dtree.yield_boosted_folds(listInst,cFold):
                 cvf.cMaxLevel = cMaxLevel
                 cvf.cMaxRounds = cMaxRounds
+                cvf.dblTrim = dblTrim
                 yield cvf
         return yield_folds
     def task(self):
@@ -211,14 +226,28 @@ class BcwCompareBoostingParameters(tftask.ChartTask):
         listInstNoisy = get_noisy_insts()
         listSeries = []
         cFold = 10
+        # the 10-round scores are read off the 30-round staged sweep
+        dictStaged = {}
+        for cMaxLevel in (1, 2):
+            fxnGen = self.build_fold_generator(cMaxLevel,30)
+            dictStaged[cMaxLevel] = [dtree.cv_score_staged(
+                    fxnGen(listInst,cFold), cWorkers=CV_WORKERS)
+                                     for listInst in (listInstClean,
+                                                      listInstNoisy)]
         for sName,cMaxLevel,cMaxRounds in [("Depth 1, 10 Rounds", 1, 10),
                                            ("Depth 2, 10 Rounds", 2, 10),
                                            ("Depth 1, 30 Rounds", 1, 30),
                                            ("Depth 2, 30 Rounds", 2, 30)]:
-            fxnGen = self.build_fold_generator(cMaxLevel,cMaxRounds)
-            fxnScore = lambda listInst: dtree.cv_score(fxnGen(listInst,cFold))
-            listData = [fxnScore(listInstClean),fxnScore(listInstNoisy)]
+            listData = [listStaged[cMaxRounds-1]
+                        for listStaged in dictStaged[cMaxLevel]]
             listSeries.append({"name":sName, "data": listData})
+        # stumps fit to the instances holding 99% of the boosting weight
+        fxnGen = self.build_fold_generator(1,30,0.99)
+        listData = [dtree.cv_score(fxnGen(listInst,cFold),
+                                   cWorkers=CV_WORKERS)
+                    for listInst in (listInstClean, listInstNoisy)]
+        listSeries.append({"name":"Depth 1, 30 Rounds, Trimmed",
+                           "data": listData})
             
         sTitle = "Classification Accuracy For Different Boosting Parameters"
         return {"chart": {"defaultSeriesType":"column"},
@@ -249,10 +278,9 @@ class BcwBoostingTrainVsTest(tftask.ChartTask):
         cFold = 10
         listSeries = []
         for sNamePref,fUseTraining in [("Training", True), ("Test", False)]:
-            listData = []
-            for cRounds in xrange(1,16):
-                fxnGen = self.build_fold_gen(cRounds,fUseTraining)
-                listData.append(dtree.cv_score(fxnGen(listInst,cFold)))
+            fxnGen = self.build_fold_gen(15,fUseTraining)
+            listData = dtree.cv_score_staged(fxnGen(listInst,cFold),
+                                             cWorkers=CV_WORKERS)
             listSeries.append({"name": sNamePref + " Set Accuracy",
                                "data": listData})
         return {"chart": {"defaultSeriesType": "line"},
@@ -73,6 +73,14 @@ def build_consistent_generator(*args, **kwargs):
         return listInst
     return wrapper
 
+def list_gains(dt):
+    if dt.is_leaf():
+        return [None]
+    listGain = [dt.dblGain]
+    for dtChild in dt.dictChildren.itervalues():
+        listGain.extend(list_gains(dtChild))
+    return listGain
+
 def build_jagged_instances():
     return [dtree.Instance([0]*random.randint(5,10))
             for _ in xrange(random.randint(25,30))]
@@ -141,6 +149,34 @@ class EntropyTest(unittest.TestCase):
         # should come up w/something stronger
         self.assertEqual(type(dictBest),dict)
 
+    @repeated
+    def test_choose_split_attribute_matches_separation(self):
+        fxnGen = build_instance_generator(cAttrs=random.randint(1,8),
+                                          fxnGenWeight=random.random)
+        listInst = fxnGen(self.cInsts)
+        listIxAttr = range(fxnGen.cAttrs)
+        random.shuffle(listIxAttr)
+        dblPrevEntropy = dtree.compute_list_entropy(listInst)
+        listAttrCounts = dtree.count_by_attribute(listIxAttr, listInst)
+        for ixAttr,dictCount in listAttrCounts:
+            dictInst = dtree.separate_by_attribute(listInst, ixAttr)
+            dblEntropy,dictEntropy = dtree.compute_entropy_of_counts(dictCount)
+            self.assertEqual(dtree.compute_entropy_of_split(dictInst),
+                             dblEntropy)
+            self.assertEqual(dictInst.keys(), dictEntropy.keys())
+            for cValue,listInstChild in dictInst.iteritems():
+                self.assertEqual(dtree.compute_list_entropy(listInstChild),
+                                 dictEntropy[cValue])
+        ixBest = dictBest = None
+        dblBestGain = 0.0
+        for ixAttr in listIxAttr:
+            dictInst = dtree.separate_by_attribute(listInst, ixAttr)
+            dblGain = dblPrevEntropy - dtree.compute_entropy_of_split(dictInst)
+            if dblGain > dblBestGain:
+                ixBest,dictBest,dblBestGain = ixAttr,dictInst,dblGain
+        self.assertEqual((ixBest,dictBest),
+                         dtree.choose_split_attribute(listIxAttr, listInst))
+
     @repeated
     def test_check_for_common_label(self):
         fxnGenTrue = build_instance_generator(1.0)
@@ -237,6 +273,25 @@ class ConstructionTest(unittest.TestCase):
             self.assertTrue(dtChild.is_leaf(), "dtChild was not a leaf")
             self.assertEqual(dtChild.fLabel, fExpected)
 
+    @repeated
+    def test_truncate(self):
+        listInst = build_instance_generator(cAttrs=5,cValues=3)(40)
+        dt = dtree.build_tree(listInst)
+        for cMaxLevel in xrange(-1,6):
+            self.assertEqual(repr(dtree.build_tree(listInst,
+                                                   cMaxLevel=cMaxLevel)),
+                             repr(dtree.truncate(dt, cMaxLevel)))
+
+    @repeated
+    def test_apply_min_gain(self):
+        listInst = build_instance_generator(cAttrs=5,cValues=3)(40)
+        for oData in (listInst, dtree.build_dataset(listInst)):
+            dt = dtree.build_tree(oData)
+            for dblMinGain in (0.0, 0.05, 0.1, 0.2, 0.5, 1.0):
+                self.assertEqual(repr(dtree.build_tree(oData,
+                                                       dblMinGain=dblMinGain)),
+                                 repr(dtree.apply_min_gain(dt, dblMinGain)))
+
     @repeated
     def test_build_tree_depth_limit(self):
         fxnGen = build_consistent_generator(10)
@@ -352,6 +407,143 @@ class PredictionTest(unittest.TestCase):
         fLabel = dtree.classify(dt,inst)
         self.assertEqual(fLabel, dt.fDefaultLabel)        
 
+class CompiledPredictionTest(unittest.TestCase):
+    REPEAT = 25
+
+    @repeated
+    def test_classify_many(self):
+        cValue = 3
+        dt = build_random_tree(4,cValue)
+        listInst = [build_random_instance_from_dt(dt,4)[0] for _ in xrange(5)]
+        listInst.extend([dtree.Instance(randlist(0, cValue+2, 4))
+                         for _ in xrange(5)])
+        ct = dtree.compile_tree(dt)
+        listExpected = [dtree.classify(dt,inst) for inst in listInst]
+        for fUseNumpy in (False, True):
+            self.assertEqual(listExpected,
+                             dtree.classify_many(ct, listInst, fUseNumpy))
+
+    def test_classify_non_integer_values(self):
+        dt = dtree.DTree(ixAttr=0, fDefaultLabel=False)
+        dt.add(dtree.DTree(fLabel=True), 1)
+        dt.add(dtree.DTree(fLabel=False), 2)
+        listInst = [dtree.Instance([value], False)
+                    for value in (1.5, "1", 1.0, 1, None)]
+        listExpected = [dtree.classify(dt,inst) for inst in listInst]
+        self.assertEqual(listExpected, dtree.classify_many_tree(dt, listInst))
+        for inst in listInst:
+            self.assertEqual(dtree.classify(dt,inst) and
+                             isinstance(inst.listAttrs[0], int),
+                             dtree.classify_compiled(dtree.compile_tree(dt),
+                                                     inst.listAttrs))
+        for fUseNumpy in (False, True):
+            self.assertEqual([False, False], dtree.classify_many(
+                    dtree.compile_tree(dt), listInst[:2], fUseNumpy))
+
+    def test_cv_score_non_integer_values(self):
+        fxnGen = build_consistent_generator(cAttrs=4, cValues=3)
+        for fxnValue in ("abc".__getitem__, lambda cValue: cValue + 0.5):
+            listInst = [dtree.Instance(map(fxnValue, inst.listAttrs),
+                                       inst.fLabel)
+                        for inst in fxnGen(40)]
+            for fxnFolds in (dtree.yield_cv_folds, dtree.yield_boosted_folds):
+                dblCorrect = dblTotal = 0.0
+                for cvf in fxnFolds(listInst, 4, 181):
+                    oCfer = cvf.build()
+                    for inst in cvf.listInstTest:
+                        if cvf.classify(oCfer, inst) == inst.fLabel:
+                            dblCorrect += inst.dblWeight
+                        dblTotal += inst.dblWeight
+                self.assertEqual(dblCorrect/dblTotal, dtree.cv_score(
+                        fxnFolds(listInst, 4, 181)))
+
+    @repeated
+    def test_classify_many_boosted(self):
+        listInst = build_consistent_generator()(50)
+        br = dtree.boost([inst.copy() for inst in listInst], cMaxRounds=5)
+        cbr = dtree.compile_boosted(br)
+        listExpected = [dtree.classify_boosted(br,inst) for inst in listInst]
+        for fUseNumpy in (False, True):
+            self.assertEqual(listExpected, dtree.classify_many_boosted(
+                cbr, dtree.build_dataset(listInst), fUseNumpy))
+
+    @repeated
+    def test_compile_classifier(self):
+        cValue = 3
+        dt = build_random_tree(4,cValue)
+        listInst = [build_random_instance_from_dt(dt,4)[0] for _ in xrange(5)]
+        listInst.extend([dtree.Instance(randlist(0, cValue+2, 4))
+                         for _ in xrange(5)])
+        for inst in listInst:
+            self.assertEqual(dtree.classify(dt,inst),
+                             dtree.classify_generated(dt,inst))
+        listInstTrain = [dtree.Instance(inst.listAttrs, randbool())
+                         for inst in listInst]
+        br = dtree.boost(listInstTrain, cMaxRounds=5)
+        for inst in listInst:
+            self.assertEqual(dtree.classify_boosted(br,inst),
+                             dtree.classify_generated(br,inst))
+
+    @repeated
+    def test_compile_stumps(self):
+        listInst = build_consistent_generator()(50)
+        br = dtree.boost([inst.copy() for inst in listInst], cMaxRounds=20)
+        st = dtree.compile_stumps(br)
+        listInst.append(dtree.Instance(randlist(0, 20, 10)))
+        for inst in listInst:
+            dblScore = 0.0
+            for dblCferWeight,dt in zip(br.listDblCferWeight,br.listCfer):
+                fLabel = dtree.classify(dt,inst)
+                dblScore += dblCferWeight if fLabel else -dblCferWeight
+            self.assertAlmostEqual(dblScore, st.score(inst.listAttrs))
+        dtDeep = dtree.DTree(ixAttr=0, fDefaultLabel=True)
+        dtChild = dtree.DTree(ixAttr=1, fDefaultLabel=False)
+        dtChild.add(dtree.DTree(fLabel=True), 0)
+        dtDeep.add(dtChild, 0)
+        self.assertRaises(ValueError, dtree.compile_stumps,
+                          dtree.BoostResult([1.0], [dtDeep]))
+
+    def test_pickle_compiled_models(self):
+        import cPickle, os, tempfile
+        listInst = build_consistent_generator()(50)
+        br = dtree.boost([inst.copy() for inst in listInst], cMaxRounds=5)
+        dt = dtree.build_tree(listInst)
+        for oModel in (dt, br):
+            listLabel = [dtree.classify_generated(oModel, inst)
+                         for inst in listInst]
+            oLoaded = cPickle.loads(cPickle.dumps(oModel,
+                                                  cPickle.HIGHEST_PROTOCOL))
+            self.assertEqual(listLabel,
+                             [dtree.classify_generated(oLoaded, inst)
+                              for inst in listInst])
+        sDir = tempfile.mkdtemp()
+        sPath = os.path.join(sDir, "checkpoint")
+        try:
+            dtree.save_checkpoint(br, sPath)
+            brLoaded = dtree.load_checkpoint(sPath)
+            self.assertEqual(br.listDblCferWeight, brLoaded.listDblCferWeight)
+            self.assertEqual(["checkpoint"], os.listdir(sDir))
+        finally:
+            os.remove(sPath)
+            os.rmdir(sDir)
+
+    def test_write_classifier_source(self):
+        import imp, os, tempfile
+        listInst = build_consistent_generator()(50)
+        br = dtree.boost([inst.copy() for inst in listInst], cMaxRounds=5)
+        fd,sPath = tempfile.mkstemp(suffix=".py")
+        os.close(fd)
+        try:
+            dtree.write_classifier_source(br, sPath, "predict")
+            module = imp.load_source("generated_classifier", sPath)
+            for inst in listInst:
+                self.assertEqual(dtree.classify_boosted(br,inst),
+                                 module.predict(inst.listAttrs))
+        finally:
+            os.remove(sPath)
+            if os.path.exists(sPath + "c"):
+                os.remove(sPath + "c")
+
 def check_instance_membership(listInstDb, listInstQueries):
     def make_key(inst):
         return tuple(inst.listAttrs + [inst.fLabel])
@@ -476,6 +668,156 @@ class CrossValidationTest(unittest.TestCase):
         dblTotalWeight = sum([inst.dblWeight for inst in listRight + listLeft])
         self.assertAlmostEqual((dblL + dblR)/dblTotalWeight, dblScore)
 
+    def test_cv_score_parallel(self):
+        listInst = build_consistent_generator(fxnGenWeight=random.random)(90)
+        for fxnFolds in (dtree.yield_cv_folds,
+                         dtree.yield_cv_folds_with_validation,
+                         dtree.yield_boosted_folds,
+                         dtree.yield_forest_folds):
+            for dataset in (listInst, dtree.build_dataset(listInst)):
+                random.seed(181)
+                dblScore = dtree.cv_score(fxnFolds(dataset, 5))
+                random.seed(181)
+                dblScoreParallel = dtree.cv_score(fxnFolds(dataset, 5),
+                                                  cWorkers=2)
+                self.assertEqual(dblScore, dblScoreParallel)
+        random.seed()
+
+    def test_detach_folds(self):
+        import cPickle
+        listInst = build_consistent_generator()(400)
+        listFold = list(dtree.yield_cv_folds_with_validation(listInst, 4))
+        listDetached,listSource,listArrIx = dtree.detach_folds(listFold)
+        self.assertEqual([listInst], listSource)
+        self.assertEqual(1, len(listArrIx))
+        self.assertTrue(len(cPickle.dumps(listDetached[0], 2)) <
+                        len(cPickle.dumps(listInst, 2))/10)
+        for cvf,cvfDetached in zip(listFold, listDetached):
+            self.assertTrue(isinstance(cvf.listInstTest, dtree.FoldView))
+            for sMember in dtree.FOLD_VIEW_MEMBERS:
+                view = getattr(cvfDetached, sMember).attach(listSource,
+                                                            listArrIx)
+                self.assertEqual(list(getattr(cvf, sMember)), list(view))
+
+    def test_yield_cv_folds_no_copy(self):
+        listInst = build_consistent_generator()(50)
+        listInstOriginal = list(listInst)
+        for fxnFolds in (dtree.yield_cv_folds,
+                         dtree.yield_cv_folds_with_validation,
+                         dtree.yield_boosted_folds):
+            listFolds = list(fxnFolds(listInst, 5, iSeed=7))
+            self.assertEqual(listInstOriginal, listInst)
+            for cvf,cvfAgain in zip(listFolds, fxnFolds(listInst, 5, 7)):
+                self.assertEqual(list(cvf.listInstTraining),
+                                 list(cvfAgain.listInstTraining))
+                self.assertEqual(list(cvf.listInstTest),
+                                 list(cvfAgain.listInstTest))
+                for inst in cvf.listInstTest:
+                    self.assertTrue(any(inst is instOrig
+                                        for instOrig in listInst))
+
+    @repeated
+    def test_cv_score_staged(self):
+        listInst = build_consistent_generator(cAttrs=5,cValues=3)(40)
+        cRounds = 6
+        iSeed = random.randint(0,1000)
+        def yield_folds(cMaxRounds):
+            for cvf in dtree.yield_boosted_folds(listInst, 4, iSeed):
+                cvf.cMaxRounds = cMaxRounds
+                yield cvf
+        listExpected = [dtree.cv_score(yield_folds(c))
+                        for c in xrange(1,cRounds+1)]
+        self.assertEqual(listExpected,
+                         dtree.cv_score_staged(yield_folds(cRounds)))
+
+    @repeated
+    def test_cv_score_depths(self):
+        listInst = build_instance_generator(cAttrs=5,cValues=3)(40)
+        listDepth = [-1, 0, 1, 2, 3]
+        iSeed = random.randint(0,1000)
+        def yield_folds(cMaxLevel):
+            for cvf in dtree.yield_cv_folds(listInst, 4, iSeed):
+                cvf.cMaxLevel = cMaxLevel
+                yield cvf
+        listExpected = [dtree.cv_score(yield_folds(d)) for d in listDepth]
+        self.assertEqual(listExpected, dtree.cv_score_depths(
+            dtree.yield_cv_folds(listInst, 4, iSeed), listDepth))
+
+    def test_score_fold_depths_keeps_fold(self):
+        listInst = build_instance_generator(cAttrs=5,cValues=3)(40)
+        cvf = iter(dtree.yield_cv_folds(listInst, 4)).next()
+        cvf.cMaxLevel = 1
+        listPair = dtree.score_fold_depths(cvf, [1, -1])
+        self.assertEqual(1, cvf.cMaxLevel)
+        self.assertEqual(dtree.score_fold(cvf), listPair[0])
+
+    @repeated
+    def test_cv_score_min_gains(self):
+        listInst = build_instance_generator(cAttrs=5,cValues=3)(40)
+        listDblMinGain = [0.0, 0.05, 0.1, 0.2]
+        iSeed = random.randint(0,1000)
+        listExpected = []
+        for dblMinGain in listDblMinGain:
+            dblCorrect = dblTotal = 0.0
+            for cvf in dtree.yield_cv_folds(listInst, 4, iSeed):
+                dt = dtree.build_tree(cvf.listInstTraining,
+                                      dblMinGain=dblMinGain)
+                for inst in cvf.listInstTest:
+                    if dtree.classify(dt,inst) == inst.fLabel:
+                        dblCorrect += inst.dblWeight
+                    dblTotal += inst.dblWeight
+            listExpected.append(dblCorrect/dblTotal)
+        listScore = dtree.cv_score_min_gains(
+            dtree.yield_cv_folds(listInst, 4, iSeed), listDblMinGain)
+        for dblExpected,dblScore in zip(listExpected, listScore):
+            self.assertAlmostEqual(dblExpected, dblScore)
+
+    @repeated
+    def test_truncate_boosted(self):
+        listInst = build_consistent_generator(cAttrs=3,cValues=2)(20)
+        br = dtree.boost([inst.copy() for inst in listInst], cMaxRounds=8)
+        for cRounds in xrange(1,9):
+            brExpected = dtree.boost([inst.copy() for inst in listInst],
+                                     cMaxRounds=cRounds)
+            brTruncated = dtree.truncate_boosted(br, cRounds)
+            self.assertEqual(brExpected.listDblCferWeight,
+                             brTruncated.listDblCferWeight)
+            self.assertEqual(map(repr,brExpected.listCfer),
+                             map(repr,brTruncated.listCfer))
+
+    def test_fold_cache(self):
+        listInst = build_consistent_generator()(50)
+        fc = dtree.FoldCache()
+        listDt = [fc.build(cvf)
+                  for cvf in dtree.yield_cv_folds(listInst, 5, iSeed=3)]
+        listDtAgain = [fc.build(cvf)
+                       for cvf in dtree.yield_cv_folds(listInst, 5, iSeed=3)]
+        for dt,dtAgain in zip(listDt, listDtAgain):
+            self.assertTrue(dt is dtAgain)
+        cvf = dtree.yield_cv_folds(listInst, 5, iSeed=3).next()
+        cvf.cMaxLevel = 1
+        self.assertFalse(fc.build(cvf) is listDt[0])
+        for inst in listInst:
+            inst.fLabel = not inst.fLabel
+        cvf = dtree.yield_cv_folds(listInst, 5, iSeed=3).next()
+        self.assertFalse(fc.build(cvf) is listDt[0])
+        self.assertEqual(repr(cvf.build()), repr(fc.build(cvf)))
+
+    def test_fold_cache_scores_track_instances(self):
+        listInst = build_instance_generator(cAttrs=4)(60)
+        fc = dtree.FoldCache(cMaxEntries=3)
+        fxnScore = lambda: dtree.cv_score(
+            dtree.yield_cv_folds(listInst, 5, iSeed=7), fc=fc)
+        fxnScoreUncached = lambda: dtree.cv_score(
+            dtree.yield_cv_folds(listInst, 5, iSeed=7))
+        self.assertEqual(fxnScoreUncached(), fxnScore())
+        self.assertEqual(3, len(fc.dictCfer))
+        for inst in listInst:
+            inst.fLabel = not inst.fLabel
+        self.assertEqual(fxnScoreUncached(), fxnScore())
+        listInst.extend(build_instance_generator(cAttrs=4)(20))
+        self.assertEqual(fxnScoreUncached(), fxnScore())
+
     @repeated
     def test_yield_cv_folds_with_validation(self):
         fxnCheck = lambda cvf: isinstance(cvf, dtree.PrunedFold)
@@ -558,7 +900,33 @@ class PruneTest(unittest.TestCase):
                 self.assertTrue(ixValue in dt.dictChildren)
                 dt = dt.dictChildren[ixValue]
             self.assertTrue(dt.is_leaf(), str(dt))
-        
+
+    @repeated
+    def test_prune_tree_matches_rescoring(self):
+        def prune_by_rescoring(dt, listInst):
+            if dt.is_leaf():
+                return
+            dictInst = dtree.separate_by_attribute(listInst,dt.ixAttr)
+            for cVal,dtChild in dt.dictChildren.items():
+                if cVal in dictInst:
+                    prune_by_rescoring(dtChild, dictInst[cVal])
+            dblBaseScore = sum([inst.dblWeight for inst in listInst
+                                if dtree.classify(dt,inst) == inst.fLabel],
+                               0.0)
+            dblDefault = sum([inst.dblWeight for inst in listInst
+                              if inst.fLabel == dt.fDefaultLabel], 0.0)
+            dblTotal = sum([inst.dblWeight for inst in listInst], 0.0)
+            if dblDefault/dblTotal >= dblBaseScore:
+                dt.convert_to_leaf()
+        fxnGen = build_instance_generator(cAttrs=5, cValues=3,
+                                          fxnGenWeight=random.random)
+        listInst = fxnGen(80)
+        dt = dtree.build_tree(listInst[:40])
+        dtExpected = dt.copy()
+        prune_by_rescoring(dtExpected, listInst[40:])
+        dtree.prune_tree(dt, listInst[40:])
+        self.assertEqual(repr(dtExpected), repr(dt))
+
 def is_stump(dt):
     for cV,dtChild in dt.dictChildren.iteritems():
         if not dtChild.is_leaf():
@@ -661,6 +1029,87 @@ class BoostTest(unittest.TestCase):
         self.assertTrue(len(br.listCfer) <= cRound)
         self.assertTrue(len(br.listDblCferWeight) <= cRound)
 
+    @repeated
+    def test_boost_stumps(self):
+        fxnGen = build_instance_generator(cAttrs=4, cValues=3,
+                                          fxnGenWeight=random.random)
+        listInst = fxnGen(random.randint(1,60))
+        listInstCopy = [inst.copy() for inst in listInst]
+        cRound = random.randint(1,25)
+        brExpected = dtree.boost([inst.copy() for inst in listInst], cRound)
+        for oData in (listInst, dtree.build_dataset(listInst)):
+            br = dtree.boost_stumps(oData, cRound)
+            self.assertEqual(brExpected.listDblCferWeight,
+                             br.listDblCferWeight)
+            self.assertEqual(map(repr,brExpected.listCfer),
+                             map(repr,br.listCfer))
+        self.assertEqual(repr(listInstCopy), repr(listInst))
+
+    @repeated
+    def test_boost_trimmed(self):
+        listInst = build_consistent_generator()(100)
+        cRound = random.randint(1,10)
+        br = dtree.boost(listInst, cRound, 1, 0.9)
+        self.assertTrue(len(br.listDblSkipped) <= cRound)
+        for dblSkipped in br.listDblSkipped:
+            self.assertTrue(0.0 <= dblSkipped < 1.0)
+        self.assertAlmostEqual(1.0, sum([inst.dblWeight for inst in listInst]))
+        self.assertEqual([1,3], dtree.select_trimmed([0.1,0.5,0.05,0.35],
+                                                     0.8))
+        self.assertEqual([0,1,2,3], dtree.select_trimmed([0.25]*4, 1.0))
+        for dblTrim in (0.0, -0.5, 1.5):
+            self.assertRaises(ValueError, dtree.select_trimmed, [0.25]*4,
+                              dblTrim)
+        self.assertRaises(ValueError, dtree.boost, listInst, cRound, 1, 0.0)
+
+    @repeated
+    def test_boost_resume(self):
+        listInst = build_instance_generator(cAttrs=4, cValues=3)(60)
+        cRound = random.randint(2,20)
+        cFirst = random.randint(1,cRound-1)
+        for fxnBoost in (dtree.boost, dtree.boost_stumps):
+            brExpected = fxnBoost([inst.copy() for inst in listInst], cRound)
+            brFirst = fxnBoost([inst.copy() for inst in listInst], cFirst)
+            br = fxnBoost([inst.copy() for inst in listInst], cRound,
+                          brResume=brFirst)
+            self.assertEqual(brExpected.listDblCferWeight,
+                             br.listDblCferWeight)
+            self.assertEqual(map(repr,brExpected.listCfer),
+                             map(repr,br.listCfer))
+            self.assertEqual(brExpected.listDblWeight, br.listDblWeight)
+            self.assertEqual(brExpected.fDone, br.fDone)
+
+    def test_boost_checkpoint(self):
+        import os, tempfile
+        listInst = build_instance_generator(cAttrs=4, cValues=3)(60)
+        fd,sPath = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            brExpected = dtree.boost([inst.copy() for inst in listInst], 10,
+                                     sCheckpoint=sPath, cCheckpointRounds=3)
+            brSaved = dtree.load_checkpoint(sPath)
+            self.assertEqual(brExpected.listDblCferWeight,
+                             brSaved.listDblCferWeight)
+            self.assertEqual(brExpected.listDblWeight, brSaved.listDblWeight)
+            self.assertFalse(os.path.exists(sPath + ".tmp"))
+        finally:
+            os.remove(sPath)
+
+    def test_save_checkpoint_errors(self):
+        import cPickle, os, tempfile
+        sDir = tempfile.mkdtemp()
+        try:
+            sPath = os.path.join(sDir, "missing", "checkpoint")
+            self.assertRaises(IOError, dtree.save_checkpoint,
+                              dtree.BoostResult([], []), sPath)
+            br = dtree.BoostResult([1.0], [lambda inst: True])
+            sPath = os.path.join(sDir, "checkpoint")
+            self.assertRaises(cPickle.PicklingError, dtree.save_checkpoint,
+                              br, sPath)
+            self.assertEqual([], os.listdir(sDir))
+        finally:
+            os.rmdir(sDir)
+
     @repeated
     def test_classify_boosted(self):
         def build_stump(fPolarity):
@@ -681,6 +1130,586 @@ class BoostTest(unittest.TestCase):
         fxnCheck = lambda cvf: isinstance(cvf,dtree.BoostedFold)
         is_valid_cvf_builder(self, dtree.yield_boosted_folds, fxnCheck, False)
         
+class DedupTest(unittest.TestCase):
+    REPEAT = 10
+
+    @repeated
+    def test_dedup_instances(self):
+        fxnGen = build_instance_generator(cAttrs=3, cValues=2,
+                                          fxnGenWeight=lambda: 2.0)
+        listInst = fxnGen(50)
+        listInstUnique,dblRatio = dtree.dedup_instances(listInst)
+        self.assertAlmostEqual(len(listInst), dblRatio*len(listInstUnique))
+        self.assertEqual(2.0*len(listInst),
+                         sum([inst.dblWeight for inst in listInstUnique]))
+        self.assertTrue(check_instance_membership(listInst, listInstUnique))
+        for oData in (listInst, dtree.build_dataset(listInst)):
+            dt = dtree.build_tree(oData)
+            dtDedup = dtree.build_tree(oData, fDedup=True)
+            self.assertEqual(repr(dt), repr(dtDedup))
+            self.assertEqual(None, dt.dblDedupRatio)
+            self.assertEqual(dblRatio, dtDedup.dblDedupRatio)
+
+    @repeated
+    def test_boost_dedup(self):
+        listInst = build_instance_generator(cAttrs=3, cValues=2)(50)
+        br = dtree.boost([inst.copy() for inst in listInst], 5)
+        brDedup = dtree.boost(listInst, 5, fDedup=True)
+        brStumps = dtree.boost_stumps(listInst, 5, fDedup=True)
+        # later rounds may break near-ties differently after rounding
+        self.assertAlmostEqual(br.listDblCferWeight[0],
+                               brDedup.listDblCferWeight[0])
+        self.assertEqual(map(repr, brDedup.listCfer),
+                         map(repr, brStumps.listCfer))
+        self.assertEqual(brDedup.listDblCferWeight,
+                         brStumps.listDblCferWeight)
+        self.assertEqual(brDedup.listDblWeight, brStumps.listDblWeight)
+        dblRatio = dtree.dedup_instances(listInst, fCount=True)[1]
+        self.assertEqual(None, br.dblDedupRatio)
+        self.assertEqual(dblRatio, brDedup.dblDedupRatio)
+        self.assertEqual(dblRatio, brStumps.dblDedupRatio)
+        self.assertTrue(all([inst.dblWeight == 1.0 for inst in listInst]))
+
+    def test_boost_dedup_rounds(self):
+        # rounding breaks no exact ties between splits or labels differently
+        # on these instances, so every round matches
+        random.seed(2)
+        listPool = build_instance_generator(cAttrs=4, cValues=3)(12)
+        listInst = [random.choice(listPool).copy() for _ in xrange(64)]
+        random.seed()
+        listUnique,dblRatio = dtree.dedup_instances(listInst, fCount=True)
+        for cMaxLevel in (1,2):
+            br = dtree.boost([inst.copy() for inst in listInst], 10,
+                             cMaxLevel)
+            brDedup = dtree.boost(listInst, 10, cMaxLevel, fDedup=True)
+            self.assertEqual(10, len(brDedup.listCfer))
+            self.assertEqual(map(repr, br.listCfer),
+                             map(repr, brDedup.listCfer))
+            for dblWeight,dblWeightDedup in zip(br.listDblCferWeight,
+                                                brDedup.listDblCferWeight):
+                self.assertAlmostEqual(dblWeight, dblWeightDedup)
+            dictWeight = {}
+            for inst,dblWeight in zip(listInst, br.listDblWeight):
+                tplKey = (tuple(inst.listAttrs), inst.fLabel)
+                dictWeight[tplKey] = dictWeight.get(tplKey, 0.0) + dblWeight
+            for inst,dblWeight in zip(listUnique, brDedup.listDblWeight):
+                tplKey = (tuple(inst.listAttrs), inst.fLabel)
+                self.assertAlmostEqual(dictWeight[tplKey], dblWeight)
+            self.assertEqual(dblRatio, brDedup.dblDedupRatio)
+
+    def test_fold_dedup_ratio(self):
+        listInst = build_instance_generator(cAttrs=3, cValues=2)(40)
+        dblRatio = dtree.dedup_instances(listInst)[1]
+        for cls in (dtree.TreeFold, dtree.PrunedFold, dtree.BoostedFold):
+            cvf = cls(listInst, listInst, listInst)
+            self.assertEqual(None, cvf.build().dblDedupRatio)
+            cvf.fDedup = True
+            self.assertEqual(dblRatio, cvf.build().dblDedupRatio)
+
+class ForestTest(unittest.TestCase):
+    REPEAT = 5
+
+    @repeated
+    def test_build_forest_parallel(self):
+        listInst = build_instance_generator(cAttrs=5, cValues=3)(60)
+        iSeed = random.randint(0,1000)
+        forest = dtree.build_forest(listInst, 6, iSeed=iSeed)
+        forestParallel = dtree.build_forest(dtree.build_dataset(listInst), 6,
+                                            iSeed=iSeed, cWorkers=2)
+        self.assertEqual(map(repr,forest.listTree),
+                         map(repr,forestParallel.listTree))
+        self.assertEqual([dtree.classify_forest(forest,inst)
+                          for inst in listInst],
+                         dtree.classify_many_forest(forest, listInst))
+
+    def test_classify_forest(self):
+        listTree = [dtree.DTree(fLabel=f) for f in (True, False, True)]
+        inst = dtree.Instance([0])
+        self.assertTrue(dtree.classify_forest(dtree.Forest(listTree), inst))
+        self.assertFalse(dtree.classify_forest(dtree.Forest(listTree[:2]),
+                                               inst))
+
+    @repeated
+    def test_build_forest_seeded(self):
+        ds = dtree.build_dataset(build_instance_generator(cAttrs=5)(40))
+        sRepr = repr(list(ds))
+        iSeed = random.randint(0,1000)
+        for cSubspace in (1, 5):
+            forest = dtree.build_forest(ds, 3, cSubspace, iSeed=iSeed)
+            forestAgain = dtree.build_forest(ds, 3, cSubspace, iSeed=iSeed)
+            self.assertEqual(map(repr,forest.listTree),
+                             map(repr,forestAgain.listTree))
+        self.assertEqual(sRepr, repr(list(ds)))
+
+    @repeated
+    def test_cv_score_forest_folds_parallel(self):
+        listInst = build_consistent_generator(cAttrs=5, cValues=3)(60)
+        def yield_folds(cWorkers):
+            for cvf in dtree.yield_forest_folds(listInst, 3, 181):
+                cvf.cTrees = 3
+                cvf.iSeed = 7
+                cvf.cWorkers = cWorkers
+                yield cvf
+        self.assertEqual(dtree.cv_score(yield_folds(0)),
+                         dtree.cv_score(yield_folds(2), cWorkers=2))
+
+    def test_cv_score_forest_folds_seeded(self):
+        listInst = build_consistent_generator(cAttrs=5, cValues=3)(60)
+        listScore = []
+        for dataset,cWorkers in ((listInst, 0), (listInst, 3),
+                                 (dtree.build_dataset(listInst), 0)):
+            random.seed(181)
+            listScore.append(dtree.cv_score(
+                    dtree.yield_forest_folds(dataset, 6), cWorkers=cWorkers))
+        random.seed()
+        self.assertEqual([listScore[0]]*3, listScore)
+
+    def test_yield_forest_folds(self):
+        fxnCheck = lambda cvf: isinstance(cvf,dtree.ForestFold)
+        is_valid_cvf_builder(self, dtree.yield_forest_folds, fxnCheck, False)
+
+class DatasetTest(unittest.TestCase):
+    REPEAT = 10
+
+    @repeated
+    def test_build_dataset(self):
+        listInst = build_random_weight(random.randint(1,50))
+        ds = dtree.build_dataset(listInst)
+        self.assertEqual(len(listInst), len(ds))
+        for inst,instDs in zip(listInst, ds):
+            self.assertEqual(inst.listAttrs, instDs.listAttrs)
+            self.assertEqual(inst.fLabel, instDs.fLabel)
+            self.assertEqual(inst.dblWeight, instDs.dblWeight)
+
+    @repeated
+    def test_build_tree_dataset(self):
+        listInst = build_random_weight(random.randint(10,100))
+        cMaxLevel = random.randint(-1,3)
+        dt = dtree.build_tree(listInst, cMaxLevel=cMaxLevel)
+        dtDs = dtree.build_tree(dtree.build_dataset(listInst),
+                                cMaxLevel=cMaxLevel)
+        self.assertEqual(repr(dt), repr(dtDs))
+
+    @repeated
+    def test_prune_tree_dataset(self):
+        listInst = build_instance_generator()(100)
+        dt = dtree.build_tree(listInst[:70])
+        dtDs = dt.copy()
+        dtree.prune_tree(dt, listInst[70:])
+        dtree.prune_tree(dtDs, dtree.build_dataset(listInst[70:]))
+        self.assertEqual(repr(dt), repr(dtDs))
+
+    @repeated
+    def test_boost_dataset(self):
+        listInst = build_consistent_generator()(100)
+        ds = dtree.build_dataset(listInst)
+        br = dtree.boost(listInst, cMaxRounds=10)
+        brDs = dtree.boost(ds, cMaxRounds=10)
+        self.assertEqual(br.listDblCferWeight, brDs.listDblCferWeight)
+        self.assertEqual(map(repr,br.listCfer), map(repr,brDs.listCfer))
+        self.assertEqual([inst.dblWeight for inst in listInst],
+                         list(ds.arrWeight))
+
+    def test_yield_cv_folds_dataset(self):
+        listInst = build_instance_generator()(60)
+        ds = dtree.build_dataset(listInst)
+        random.seed(181)
+        dblScore = dtree.cv_score(dtree.yield_cv_folds(listInst, 6))
+        random.seed(181)
+        dblScoreDs = dtree.cv_score(dtree.yield_cv_folds(ds, 6))
+        random.seed()
+        self.assertEqual(dblScore, dblScoreDs)
+
+class InPlaceBuildTest(unittest.TestCase):
+    REPEAT = 10
+
+    @repeated
+    def test_partition_rows_in_place(self):
+        listInst = build_instance_generator(cValues=5)(random.randint(1,50))
+        ds = dtree.build_dataset(listInst)
+        arrIx = dtree.array.array("l", range(len(ds)))
+        ixStart = random.randint(0, len(ds)-1)
+        rr = dtree.RowRange(arrIx, ixStart, len(ds))
+        dictRange = dtree.partition_rows_in_place(ds, rr, 0)
+        dictIx = dtree.separate_rows_by_attribute(ds, range(ixStart,len(ds)),
+                                                  0)
+        self.assertEqual(dictIx.keys(), dictRange.keys())
+        for cValue,rrChild in dictRange.iteritems():
+            self.assertEqual(sorted(dictIx[cValue]), sorted(rrChild))
+        self.assertEqual(range(ixStart), list(arrIx[:ixStart]))
+        self.assertEqual(range(len(ds)), sorted(arrIx))
+
+    @repeated
+    def test_build_tree_in_place(self):
+        fxnGen = build_consistent_generator(cAttrs=5, cValues=3)
+        listInst = fxnGen(random.randint(10,60))
+        cMaxLevel = random.randint(-1,3)
+        dt = dtree.build_tree(listInst, cMaxLevel=cMaxLevel, fInPlace=True)
+        self.assertTrue(check_dt_members(dt)[0])
+        if cMaxLevel < 0:
+            for inst in listInst:
+                self.assertEqual(inst.fLabel, dtree.classify(dt, inst))
+        self.assertEqual(repr(dtree.build_tree(listInst, cMaxLevel=1)),
+                         repr(dtree.build_tree(listInst, cMaxLevel=1,
+                                               fInPlace=True)))
+
+class StreamingBuildTest(unittest.TestCase):
+    REPEAT = 10
+
+    def write_rows(self, listInst):
+        import StringIO
+        return StringIO.StringIO("".join(
+                " ".join(map(str, inst.listAttrs + [int(inst.fLabel)])) + "\n"
+                for inst in listInst))
+
+    @repeated
+    def test_build_tree_streaming(self):
+        fxnGen = build_instance_generator(cAttrs=random.randint(1,6),
+                                          cValues=random.randint(2,10))
+        infile = self.write_rows(fxnGen(random.randint(1,80)))
+        listInst = dtree.load_csv_dataset(infile)
+        cMaxLevel = random.randint(-1,3)
+        dblMinGain = random.choice([0.0, 0.05])
+        self.assertEqual(repr(dtree.build_tree(listInst, dblMinGain,
+                                               cMaxLevel)),
+                         repr(dtree.build_tree_streaming(infile, dblMinGain,
+                                                         cMaxLevel)))
+
+    def test_build_tree_streaming_raises(self):
+        infile = self.write_rows([])
+        self.assertRaises(ValueError, dtree.build_tree_streaming, infile)
+        infile.write("1 2 1\n1 0\n")
+        self.assertRaises(TypeError, dtree.build_tree_streaming, infile)
+
+class HoeffdingTreeTest(unittest.TestCase):
+    REPEAT = 10
+
+    @repeated
+    def test_learns_consistent_concept(self):
+        fxnLabel = lambda listAttrs: listAttrs[2] > 1 or listAttrs[0] == 0
+        fxnGen = build_instance_generator(cAttrs=5, fxnGenLabel=fxnLabel)
+        ht = dtree.HoeffdingTree(5, cGracePeriod=50)
+        ht.add_many(fxnGen(3000))
+        self.assertTrue(check_dt_members(ht.dtRoot)[0])
+        for inst in fxnGen(100):
+            self.assertEqual(inst.fLabel, dtree.classify(ht.dtRoot, inst))
+
+    @repeated
+    def test_majority_before_grace_period(self):
+        listInst = build_instance_generator(cAttrs=3)(random.randint(1,49))
+        ht = dtree.HoeffdingTree(3, cGracePeriod=50)
+        ht.add_many(listInst)
+        self.assertTrue(ht.dtRoot.is_leaf())
+        dblT = sum(inst.dblWeight for inst in listInst if inst.fLabel)
+        if 2*dblT != len(listInst):
+            self.assertEqual(dtree.majority_label(listInst),
+                             ht.dtRoot.fLabel)
+
+    def test_max_level_and_tree_copy(self):
+        fxnLabel = lambda listAttrs: listAttrs[0] > 1
+        fxnGen = build_instance_generator(cAttrs=3, fxnGenLabel=fxnLabel)
+        ht = dtree.HoeffdingTree(3, cGracePeriod=20, cMaxLevel=1)
+        ht.add_many(fxnGen(2000))
+        self.assertTrue(ht.dtRoot.is_node())
+        for dtChild in ht.dtRoot.dictChildren.itervalues():
+            self.assertTrue(dtChild.is_leaf())
+        sTree = repr(ht.dtRoot)
+        dt = ht.tree()
+        dtree.prune_tree(dt, fxnGen(50))
+        self.assertEqual(sTree, repr(ht.dtRoot))
+
+    def test_bound_counts_instances(self):
+        fxnLabel = lambda listAttrs: listAttrs[0] > 1
+        fxnGen = build_instance_generator(cAttrs=3, fxnGenLabel=fxnLabel,
+                                          fxnGenWeight=lambda: 0.001)
+        ht = dtree.HoeffdingTree(3, cGracePeriod=20, cMaxLevel=1)
+        ht.add_many(fxnGen(2000))
+        self.assertEqual(0, ht.dtRoot.ixAttr)
+
+class IncrementalTreeTest(unittest.TestCase):
+    REPEAT = 10
+
+    @repeated
+    def test_matches_full_build(self):
+        fxnWeight = random.choice([lambda: 1.0, random.random])
+        fxnGen = build_instance_generator(cAttrs=random.randint(1,10),
+                                          cValues=random.randint(2,5),
+                                          fxnGenWeight=fxnWeight)
+        listInst = fxnGen(random.randint(1,100))
+        cMaxLevel = random.randint(-1,3)
+        dblMinGain = random.choice([0.0, 0.05])
+        cInitial = random.randint(1,len(listInst))
+        it = dtree.IncrementalTree(listInst[:cInitial], dblMinGain, cMaxLevel)
+        while len(it.listInst) < len(listInst):
+            cInst = len(it.listInst)
+            it.add_many(listInst[cInst:cInst + random.randint(0,20)])
+            dt = dtree.build_tree(it.listInst, dblMinGain, cMaxLevel)
+            self.assertEqual(repr(dt), repr(it.dtRoot))
+            self.assertEqual(list_gains(dt), list_gains(it.dtRoot))
+
+    def test_adopts_existing_tree(self):
+        listInst = build_instance_generator(cAttrs=4)(60)
+        dt = dtree.build_tree(listInst[:40])
+        it = dtree.IncrementalTree(listInst[:40], dt=dt)
+        it.add_many(listInst[40:])
+        self.assertEqual(repr(dtree.build_tree(listInst)), repr(it.dtRoot))
+        self.assertRaises(TypeError, it.add_many,
+                          [dtree.Instance([0,1], True)])
+
+class BoundedSplitSearchTest(unittest.TestCase):
+    REPEAT = 20
+
+    @repeated
+    def test_matches_exhaustive_search(self):
+        fxnWeight = random.choice([lambda: 1.0, random.random])
+        fxnGen = build_instance_generator(cAttrs=random.randint(1,12),
+                                          cValues=random.randint(2,5),
+                                          fxnGenWeight=fxnWeight)
+        listInst = fxnGen(random.randint(1,120))
+        cMaxLevel = random.randint(-1,3)
+        dblMinGain = random.choice([0.0, 0.05])
+        bss = dtree.BoundedSplitSearch(random.choice([0.01, 0.125, 1.0]),
+                                       random.choice([1, 4, 64]))
+        dt = dtree.build_tree(listInst, dblMinGain, cMaxLevel)
+        dtBounded = dtree.build_tree(listInst, dblMinGain, cMaxLevel,
+                                     bss=bss)
+        self.assertEqual(repr(dt), repr(dtBounded))
+        self.assertEqual(list_gains(dt), list_gains(dtBounded))
+
+    def test_skips_irrelevant_attributes(self):
+        fxnGen = build_instance_generator(cAttrs=40,
+                                          fxnGenLabel=lambda l: l[7] > 1)
+        bss = dtree.BoundedSplitSearch()
+        dt = dtree.build_tree(fxnGen(1000), cMaxLevel=1, bss=bss)
+        self.assertEqual(7, dt.ixAttr)
+        self.assertEqual(40, bss.cEvaluated + bss.cSkipped)
+        self.assertTrue(bss.cSkipped > 0)
+        self.assertRaises(ValueError, dtree.build_tree, fxnGen(10),
+                          sBackend=dtree.BACKEND_NUMPY, bss=bss)
+
+class BestFirstBuildTest(unittest.TestCase):
+    REPEAT = 20
+
+    def count_nodes(self, dt):
+        return 1 + sum(self.count_nodes(dtChild)
+                       for dtChild in dt.dictChildren.itervalues())
+
+    @repeated
+    def test_unbounded_matches_build_tree(self):
+        fxnWeight = random.choice([lambda: 1.0, random.random])
+        fxnGen = build_instance_generator(cAttrs=random.randint(1,8),
+                                          cValues=random.randint(2,5),
+                                          fxnGenWeight=fxnWeight)
+        listInst = fxnGen(random.randint(1,100))
+        cMaxLevel = random.randint(-1,3)
+        dblMinGain = random.choice([0.0, 0.05])
+        dt = dtree.build_tree(listInst, dblMinGain, cMaxLevel)
+        dtBestFirst = dtree.build_tree_best_first(listInst, dblMinGain,
+                                                  cMaxLevel)
+        self.assertEqual(repr(dt), repr(dtBestFirst))
+        self.assertEqual(list_gains(dt), list_gains(dtBestFirst))
+
+    @repeated
+    def test_node_budget(self):
+        fxnGen = build_consistent_generator(cAttrs=5, cValues=3)
+        listInst = fxnGen(random.randint(1,100))
+        cMaxNodes = random.randint(1,30)
+        dt = dtree.build_tree_best_first(listInst, cMaxNodes=cMaxNodes)
+        self.assertTrue(check_dt_members(dt)[0])
+        self.assertTrue(self.count_nodes(dt) <= cMaxNodes)
+
+    def test_stops_at_deadline_and_gain_floor(self):
+        listInst = build_instance_generator(cAttrs=4)(50)
+        dblDeadline = dtree.time.time()
+        for dt in (dtree.build_tree_best_first(listInst,
+                                               dblDeadline=dblDeadline),
+                   dtree.build_tree_best_first(listInst,
+                                               dblMinWeightedGain=1.0)):
+            self.assertTrue(dt.is_leaf())
+            self.assertEqual(dtree.majority_label(listInst), dt.fLabel)
+
+class ParallelBuildTest(unittest.TestCase):
+    def test_build_tree_parallel(self):
+        fxnGen = build_instance_generator(cAttrs=6, cValues=3,
+                                          fxnGenWeight=random.random)
+        listInst = fxnGen(300)
+        for cMaxLevel in (-1, 2):
+            dt = dtree.build_tree(listInst, cMaxLevel=cMaxLevel)
+            dtParallel = dtree.build_tree(listInst, cMaxLevel=cMaxLevel,
+                                          cWorkers=2, cParallelMin=20)
+            self.assertEqual(repr(dt), repr(dtParallel))
+
+    def test_parallel_tree_builder(self):
+        class SerialPool(object):
+            def __init__(self):
+                self.listSize = []
+            def apply_async(self, fxn, tplArgs):
+                self.listSize.append(len(tplArgs[2]))
+                sResult = fxn(*tplArgs)
+                class Result(object):
+                    def get(self):
+                        return sResult
+                return Result()
+        fxnGen = build_instance_generator(cAttrs=6, cValues=3)
+        listInst = fxnGen(400)
+        # -2 and -1 share a hash, so the order of a node's children depends
+        # on the order they are added in
+        for inst in listInst:
+            inst.listAttrs = [cValue - 2 for cValue in inst.listAttrs]
+        pool = SerialPool()
+        ptb = dtree.ParallelTreeBuilder(pool, 6, 10, 50)
+        dt = ptb.build(listInst, 0.0, -1)
+        self.assertEqual(repr(dtree.build_tree(listInst)), repr(dt))
+        self.assertEqual(list_gains(dtree.build_tree(listInst)),
+                         list_gains(dt))
+        self.assertTrue(pool.listSize)
+        self.assertEqual(sorted(pool.listSize, reverse=True), pool.listSize)
+        for cSize in pool.listSize:
+            self.assertTrue(10 < cSize <= 50)
+
+    def test_build_tree_parallel_raises(self):
+        self.assertRaises(ValueError, dtree.build_tree,
+                          build_consistent_generator()(10), cWorkers=2,
+                          fInPlace=True)
+
+class NumpyBackendTest(unittest.TestCase):
+    REPEAT = 10
+
+    @unittest.skipIf(dtree.numpy is None, "numpy is not installed")
+    @repeated
+    def test_count_rows_numpy(self):
+        fxnGen = build_instance_generator(cAttrs=random.randint(1,8),
+                                          cValues=random.randint(2,12),
+                                          fxnGenWeight=random.random)
+        listInst = fxnGen(100)
+        nc = dtree.NumpyColumns(dtree.build_dataset(listInst))
+        listIxAttr = range(fxnGen.cAttrs)
+        random.shuffle(listIxAttr)
+        listExpected = dtree.count_by_attribute(listIxAttr, listInst)
+        listAttrCounts = dtree.count_rows_numpy(
+            nc, dtree.numpy.arange(len(listInst)), listIxAttr)
+        self.assertEqual([(ixAttr,dictCount.items())
+                          for ixAttr,dictCount in listExpected],
+                         [(ixAttr,dictCount.items())
+                          for ixAttr,dictCount in listAttrCounts])
+
+    @unittest.skipIf(dtree.numpy is None, "numpy is not installed")
+    @repeated
+    def test_build_tree_numpy(self):
+        fxnWeight = random.choice([lambda: 1.0, random.random])
+        fxnGen = build_instance_generator(cAttrs=random.randint(1,8),
+                                          cValues=random.randint(2,5),
+                                          fxnGenWeight=fxnWeight)
+        listInst = fxnGen(random.randint(1,80))
+        cMaxLevel = random.randint(-1,3)
+        dt = dtree.build_tree(listInst, cMaxLevel=cMaxLevel)
+        for fInPlace in (False, True):
+            dtNumpy = dtree.build_tree(listInst, cMaxLevel=cMaxLevel,
+                                       sBackend=dtree.BACKEND_NUMPY,
+                                       fInPlace=fInPlace)
+            self.assertEqual(repr(dt), repr(dtNumpy))
+            self.assertEqual(list_gains(dt), list_gains(dtNumpy))
+
+    def test_build_tree_numpy_fallback(self):
+        listInst = build_consistent_generator()(50)
+        numpyModule = dtree.numpy
+        dtree.numpy = None
+        try:
+            dt = dtree.build_tree(listInst, sBackend=dtree.BACKEND_NUMPY)
+        finally:
+            dtree.numpy = numpyModule
+        self.assertEqual(repr(dtree.build_tree(listInst)), repr(dt))
+
+    def test_build_tree_unknown_backend(self):
+        self.assertRaises(ValueError, dtree.build_tree,
+                          build_consistent_generator()(10), sBackend="gpu")
+
+class BitsetBackendTest(unittest.TestCase):
+    REPEAT = 10
+
+    @repeated
+    def test_bitset_rows_round_trip(self):
+        listIx = sorted(random.sample(xrange(200), random.randint(0,50)))
+        bits = dtree.bitset_from_rows(listIx)
+        self.assertEqual(listIx, dtree.rows_of_bitset(bits))
+        self.assertEqual(len(listIx), dtree.popcount(bits))
+
+    @repeated
+    def test_build_tree_bitset(self):
+        fxnWeight = random.choice([lambda: 1.0, random.random])
+        fxnGen = build_instance_generator(cAttrs=5, cValues=12,
+                                          fxnGenWeight=fxnWeight)
+        listInst = fxnGen(random.randint(1,80))
+        cMaxLevel = random.randint(-1,3)
+        dblMinGain = random.choice([0.0, 0.05])
+        sTree = repr(dtree.build_tree(listInst, dblMinGain, cMaxLevel))
+        ds = dtree.build_dataset(listInst)
+        cRatioDefault = dtree.BITSET_SPARSE_RATIO
+        try:
+            for cRatio in (0, cRatioDefault):
+                dtree.BITSET_SPARSE_RATIO = cRatio
+                for oInst in (listInst, ds, ds):
+                    dt = dtree.build_tree(oInst, dblMinGain, cMaxLevel,
+                                          sBackend=dtree.BACKEND_BITSET)
+                    self.assertEqual(sTree, repr(dt))
+        finally:
+            dtree.BITSET_SPARSE_RATIO = cRatioDefault
+
+    def test_bitset_index_cache(self):
+        listInst = build_instance_generator(cAttrs=3)(40)
+        ds = dtree.build_dataset(listInst)
+        dtree.build_tree(ds, sBackend=dtree.BACKEND_BITSET)
+        self.assertTrue(ds.bitsetIndex is not None)
+        inst = listInst[7]
+        inst.fLabel = not inst.fLabel
+        ds.set_label(7, inst.fLabel)
+        self.assertTrue(ds.bitsetIndex is None)
+        self.assertEqual(repr(dtree.build_tree(listInst)),
+                         repr(dtree.build_tree(
+                    ds, sBackend=dtree.BACKEND_BITSET)))
+
+    @repeated
+    def test_build_fold_bitset(self):
+        fxnWeight = random.choice([lambda: 1.0, random.random])
+        fxnGen = build_instance_generator(cAttrs=5, cValues=3,
+                                          fxnGenWeight=fxnWeight)
+        ds = dtree.build_dataset(fxnGen(random.randint(40,120)))
+        listFold = list(dtree.yield_cv_folds_with_validation(ds, 4))
+        for cvf in listFold:
+            for oInst in (cvf.listInstTraining, cvf.listInstValidate):
+                dt = dtree.build_tree(oInst)
+                dtBitset = dtree.build_tree(oInst,
+                                            sBackend=dtree.BACKEND_BITSET)
+                self.assertEqual(repr(dt), repr(dtBitset))
+                self.assertEqual(list_gains(dt), list_gains(dtBitset))
+        bsi = ds.bitsetIndex
+        self.assertTrue(bsi.arrOrder is listFold[0].listInstTest.rows.arrIx)
+        dtree.build_tree(listFold[-1].listInstTest,
+                         sBackend=dtree.BACKEND_BITSET)
+        self.assertTrue(bsi is ds.bitsetIndex)
+
+    def test_bitsets_by_value(self):
+        listValue = [3, 300, 3, -1, 0]
+        for listV in (listValue, listValue[:3:2] + [0]):
+            dictBits = dtree.bitsets_by_value(listV)
+            self.assertEqual(sorted(set(listV)), sorted(dictBits))
+            for cValue,bits in dictBits.iteritems():
+                self.assertEqual([ix for ix,v in enumerate(listV)
+                                  if v == cValue],
+                                 dtree.rows_of_bitset(bits))
+
+    def test_cv_score_bitset(self):
+        listInst = build_instance_generator(cAttrs=5)(60)
+        random.seed(181)
+        dblScore = dtree.cv_score(dtree.yield_cv_folds(listInst, 6))
+        random.seed(181)
+        listFold = list(dtree.yield_cv_folds(dtree.build_dataset(listInst),
+                                             6))
+        for cvf in listFold:
+            cvf.sBackend = dtree.BACKEND_BITSET
+        random.seed()
+        self.assertEqual(dblScore, dtree.cv_score(listFold))
+
 if __name__ == "__main__":
     import sys
     sys.exit(unittest.main())